@@ -0,0 +1,117 @@
+"""Tiny benchmark harness: time, memory and deep copies per operation, with JSON baselines.
+
+Shared by mcp-server-demo/benchmarks and mcp-client/benchmarks: `benchmarks` has no `__init__.py`
+in any of the three directories, so with the repository root on sys.path `benchmarks.harness`
+resolves here while each project's own benchmark modules still resolve in its directory.
+
+Latencies are machine dependent, compare against baselines recorded on the same machine.
+Memory figures barely move between runs and copy counts are exact, so they travel well.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import asyncio
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+# A regression is reported past these ratios of the baseline, latencies are noisy on shared machines
+LATENCY_TOLERANCE = float(os.getenv("BENCH_LATENCY_TOLERANCE", "1.5"))
+MEMORY_TOLERANCE = float(os.getenv("BENCH_MEMORY_TOLERANCE", "1.1"))
+
+Operation = Union[Callable[[], Any], Callable[[], Awaitable[Any]]]
+
+
+class _CopyCounter:
+    """Counts copy.deepcopy calls while active, modules look it up at call time."""
+
+    def __init__(self):
+        self.calls = 0
+        self._deepcopy = copy.deepcopy
+
+    def __enter__(self):
+        def counting_deepcopy(*args, **kwargs):
+            self.calls += 1
+            return self._deepcopy(*args, **kwargs)
+        copy.deepcopy = counting_deepcopy
+        return self
+
+    def __exit__(self, *exc):
+        copy.deepcopy = self._deepcopy
+
+
+def _runner(fn: Operation, is_async: bool, loop: Optional[asyncio.AbstractEventLoop]):
+    if is_async:
+        return lambda: loop.run_until_complete(fn())
+    return fn
+
+def measure(fn: Operation, iterations: int, repeat: int = 5, is_async: bool = False, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Best time per call over `repeat` rounds of `iterations` calls (the least disturbed by the rest
+    of the machine), then one traced call for the memory figures (peak and still held afterwards,
+    in KiB) and the number of deep copies."""
+    loop = asyncio.new_event_loop() if is_async else None
+    run = _runner(fn, is_async, loop)
+    try:
+        if setup:
+            setup()
+        run()  # warm up caches, imports and the event loop
+        rounds = []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                run()
+            rounds.append((time.perf_counter() - started) / iterations)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        with _CopyCounter() as copies:
+            start, _ = tracemalloc.get_traced_memory()
+            run()
+            current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if loop:
+            loop.close()
+    return {
+        "time_us": round(min(rounds) * 1e6, 2),
+        "peak_kb": round((peak - start) / 1024, 2),
+        "retained_kb": round((current - start) / 1024, 2),
+        "deepcopies": copies.calls,
+    }
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> list[str]:
+    """Regressions of `results` against `baseline`, as readable lines."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["time_us"] > base["time_us"] * LATENCY_TOLERANCE:
+            regressions.append(f"{name}: time {base['time_us']}us -> {result['time_us']}us")
+        if result["peak_kb"] > base["peak_kb"] * MEMORY_TOLERANCE + 1:
+            regressions.append(f"{name}: peak memory {base['peak_kb']}KiB -> {result['peak_kb']}KiB")
+        if result["deepcopies"] > base["deepcopies"]:
+            regressions.append(f"{name}: deep copies {base['deepcopies']} -> {result['deepcopies']}")
+    return regressions
+
+def report(results: Dict[str, Dict[str, float]], baseline_path: Path, argv: list[str] = sys.argv[1:]) -> int:
+    """Print the results; `--save` records them as the baseline, `--compare` exits 1 on regressions."""
+    print(json.dumps(results, indent=2))
+    if "--save" in argv:
+        baseline_path.parent.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+    if "--compare" in argv:
+        if not baseline_path.exists():
+            print(f"No baseline at {baseline_path}, run with --save first", file=sys.stderr)
+            return 1
+        regressions = compare(results, json.loads(baseline_path.read_text()))
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
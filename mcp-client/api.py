@@ -1,12 +1,39 @@
+import os
 import json
+import logging
 from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from client import MCPClient
+from client import MCPClient, close_anthropic_client
+from chat_store import CHAT_STORE, get_chat_store
+from session_pool import MCPClientPool
+from session_manager import ChatSession, SessionManager
 from pydantic import BaseModel
 import uuid
 
-app = FastAPI(title="MCP Client API")
+logger = logging.getLogger(__name__)
+
+# Warm MCP sessions for the requests without a chat session
+pool = MCPClientPool()
+# Store active sessions, their history is kept in the chat store shared by the workers
+sessions = SessionManager(store=get_chat_store())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the MCP session pool and the session reaper, close them and the shared model API
+    connections on shutdown."""
+    await pool.start()
+    await sessions.start()
+    try:
+        yield
+    finally:
+        await sessions.close()
+        await pool.close()
+        await close_anthropic_client()
+
+app = FastAPI(title="MCP Client API", lifespan=lifespan)
 
 # Add CORS middleware to allow React frontend to call our API
 app.add_middleware(
@@ -25,13 +52,11 @@ class Message(BaseModel):
 #         self.role = role
 #         self.content = content
 
-class ChatSession:
-    def __init__(self, messages: List[Dict[str, str]], client: MCPClient):
-        self.messages = messages # [{role: str, content: str}]
-        self.client = client
+NDJSON = "application/x-ndjson"
+SESSION_LOGIN_CERT = "PV LoginCert the session was started with, needed when another worker opened the session"
 
-# Store active sessions
-sessions: Dict[str, ChatSession] = {}
+def ndjson(event: Dict) -> str:
+    return json.dumps(event, default=str) + "\n"
 
 @app.get("/chat/start")
 async def start_chat(loginCert: Optional[str] = Query(..., description="PV LoginCert")):
@@ -40,9 +65,10 @@ async def start_chat(loginCert: Optional[str] = Query(..., description="PV Login
     client = MCPClient(PF_loginCert=loginCert)
     
     try:
-        await client.connect_to_mcp_server_streamable_http_transport()
-        sessions[session_id] = ChatSession(messages=[{"role":"assistant", "content":"you are like a global search with enhanced context. The enhanced context is provided to you via the mcp tools registered"}], client=client)
-        print(f"[Chat] Session started for loginCert={client.PF_loginCert}, session_id={session_id}")
+        # The preamble is sent as the (cached) system prompt of every request, see client.SYSTEM_PROMPT
+        # Only a hash of the loginCert is stored, other workers need it resent to reopen the session
+        await sessions.create(session_id, client)
+        logger.info("[Chat] Session started, session_id=%s", session_id)
         return {"session_id": session_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -62,63 +88,145 @@ async def start_chat(loginCert: Optional[str] = Query(..., description="PV Login
 #         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat/{session_id}/message")
-async def send_message(session_id: str, message: Message):
+async def send_message(session_id: str, message: Message, loginCert: Optional[str] = Query(None, description=SESSION_LOGIN_CERT)):
     """Send a message in an existing chat session"""
     message = message.message
-    if session_id not in sessions:
+    try:
+        chat_session = await sessions.get(session_id, loginCert)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if chat_session is None:
         return {"status": "Error: Session not found"}
     
-    chat_session = sessions[session_id]
     client = chat_session.client
-    messages = chat_session.messages
-    messages.append({"role": "user", "content": message})
+    conversation = chat_session.conversation
+    conversation.append({"role": "user", "content": message})
     
     try:
-        response = await client.process_antropic_query(messages)
-        if isinstance(response, dict):
-            assistant_message = {"role": "assistant", "content": json.dumps(response)}
-        else:
-            assistant_message = {"role": "assistant", "content": response}
-        messages.append(assistant_message)
-        return {"response": response, "messages": messages}
+        with chat_session.using():
+            # The query adds its tool exchange and answer to the conversation
+            response = await client.process_antropic_query(conversation)
+        await sessions.save(session_id, chat_session)
+        return {"response": response, "messages": conversation.messages}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/{session_id}/message/stream")
+async def stream_message(session_id: str, message: Message, loginCert: Optional[str] = Query(None, description=SESSION_LOGIN_CERT)):
+    """Send a message in an existing chat session, the answer is streamed as NDJSON events
+    (text deltas, tool_start / tool_end, progress, then done or error). The history is updated
+    once the answer is complete."""
+    try:
+        chat_session = await sessions.get(session_id, loginCert)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if chat_session is None:
+        return {"status": "Error: Session not found"}
+
+    conversation = chat_session.conversation
+    conversation.append({"role": "user", "content": message.message})
+
+    async def events():
+        done = False
+        with chat_session.using():
+            async for event in chat_session.client.query_events(conversation):
+                if event["type"] == "done":
+                    done = True
+                yield ndjson(event)
+        if done:
+            await sessions.save(session_id, chat_session)
+    return StreamingResponse(events(), media_type=NDJSON)
     
 @app.post("/chat/message")
 async def send_message_without_session(message: Message, loginCert: Optional[str] = Query(..., description="PV LoginCert")):
-    """Send a message in an existing chat session"""
+    """Send a message without a chat session, on a pooled MCP session"""
     message = message.message
-    client = MCPClient(PF_loginCert=loginCert)
-    await client.connect_to_mcp_server_streamable_http_transport()
-        
     try:
-        messages = [{"role": "user", "content": message}]
-        response = await client.process_antropic_query(messages)
+        async with pool.lease(PF_loginCert=loginCert) as client:
+            messages = [{"role": "user", "content": message}]
+            response = await client.process_antropic_query(messages)
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 
+@app.post("/chat/message/stream")
+async def stream_message_without_session(message: Message, loginCert: Optional[str] = Query(..., description="PV LoginCert")):
+    """Send a message without a chat session, the answer is streamed as NDJSON events"""
+    async def events():
+        try:
+            async with pool.lease(PF_loginCert=loginCert) as client:
+                async for event in client.query_events([{"role": "user", "content": message.message}]):
+                    yield ndjson(event)
+        except Exception as e:
+            yield ndjson({"type": "error", "detail": str(e)})
+    return StreamingResponse(events(), media_type=NDJSON)
+
+@app.get("/pool/stats")
+async def get_pool_stats():
+    """Sessions of the MCP session pool"""
+    return pool.stats()
+
+@app.get("/sessions/stats")
+async def get_session_stats():
+    """Open chat sessions and the memory held by their history"""
+    return sessions.stats()
+
 @app.get("/chat/{session_id}/history")
-async def get_chat_history(session_id: str):
+async def get_chat_history(session_id: str, loginCert: Optional[str] = Query(None, description=SESSION_LOGIN_CERT)):
     """Get the chat history for a session"""
-    if session_id not in sessions:
+    try:
+        stored = await sessions.load(session_id, loginCert)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if stored is None:
         return {"status": "Error: Session not found"}
     
-    chat_session = sessions[session_id]
-    return {"messages": chat_session.messages}
+    return {"messages": stored.messages}
+
+@app.get("/chat/{session_id}/usage")
+async def get_chat_usage(session_id: str, loginCert: Optional[str] = Query(None, description=SESSION_LOGIN_CERT)):
+    """Model token usage of a session, with the prompt cache reads and writes"""
+    try:
+        stored = await sessions.load(session_id, loginCert)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if stored is None:
+        return {"status": "Error: Session not found"}
+
+    return {"usage": stored.usage}
 
 @app.delete("/chat/{session_id}")
-async def end_chat(session_id: str):
+async def end_chat(session_id: str, loginCert: Optional[str] = Query(None, description=SESSION_LOGIN_CERT)):
     """End a chat session and cleanup resources"""
-    if session_id not in sessions:
+    try:
+        ended = await sessions.end(session_id, loginCert)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if not ended:
         return {"status": "Error: Session not found"}
     
-    chat_session = sessions[session_id]
-    await chat_session.client.cleanup()
-    del sessions[session_id]
     return {"status": "success"}
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8050)
+    parser = argparse.ArgumentParser(description="Run the MCP client API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")),
+                        help="Worker processes, any of them serves any chat session (default: $API_WORKERS or 1)")
+    args = parser.parse_args()
+    if args.workers > 1 and not sessions.store.shared:
+        parser.error(f"--workers needs a chat store shared between processes, CHAT_STORE={CHAT_STORE} is not")
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    if args.workers > 1:
+        # Each worker imports the app itself
+        uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
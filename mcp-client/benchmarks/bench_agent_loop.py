@@ -0,0 +1,132 @@
+"""MCPClient.process_antropic_query with a model stub that asks for TOOLS tools at once, twice,
+then answers, and tools that take TOOL_LATENCY seconds each. Concurrent tool calls finish a
+step in about one tool latency, sequential ones would take the sum. Also checks the history
+of the loop: one assistant message and one message with all the tool results per step, that a
+step whose tools return JSON answers with every result of the step, that the history ends with
+the last step's text only, and that no tool runs in the last allowed step. Exits 1 when the tool calls were serialized or a check failed.
+
+    python benchmarks/bench_agent_loop.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+from mcp import types
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+import client as client_module
+from client import TOOL_CONCURRENCY
+from conversation import Conversation
+from benchmarks.bench_client import StubSession, stub_client, text_block
+
+TOOLS = 4
+STEPS = 2
+TOOL_LATENCY = 0.3
+FINAL_ANSWER = "All strategies are active."
+
+
+class SlowToolSession(StubSession):
+    async def call_tool(self, name, arguments, read_timeout_seconds=None, progress_callback=None):
+        await asyncio.sleep(TOOL_LATENCY)
+        return types.CallToolResult(content=[types.TextContent(type="text", text=f"{name} of {arguments['id']} is active.")])
+
+
+class CountingSession(StubSession):
+    """Counts the tool calls. With `redirect`, tool_0 answers with a JSON payload for the caller."""
+
+    def __init__(self, redirect: bool = False):
+        super().__init__()
+        self.redirect = redirect
+        self.calls = 0
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None, progress_callback=None):
+        self.calls += 1
+        text = json.dumps({"type": "redirect", "data": "/plan"}) if self.redirect and name == "tool_0" else f"{name} is active."
+        return types.CallToolResult(content=[types.TextContent(type="text", text=text)])
+
+
+def tool_step(step: int):
+    tool_uses = [
+        SimpleNamespace(type="tool_use", id=f"toolu_{step}_{n}", name=f"tool_{n}", input={"id": str(n)})
+        for n in range(TOOLS)
+    ]
+    return SimpleNamespace(content=[text_block(f"Step {step}, looking up {TOOLS} strategies.")] + tool_uses, stop_reason="tool_use")
+
+def check_history(messages: list) -> list:
+    problems = []
+    expected_roles = ["user"] + ["assistant", "user"] * STEPS + ["assistant"]
+    if [message["role"] for message in messages] != expected_roles:
+        problems.append(f"roles {[message['role'] for message in messages]}")
+        return problems
+    if messages[-1]["content"] != FINAL_ANSWER:
+        problems.append(f"history ends with {messages[-1]['content']!r}")
+    for step in range(STEPS):
+        assistant, results = messages[1 + 2 * step], messages[2 + 2 * step]
+        tool_use_ids = [block["id"] for block in assistant["content"] if block["type"] == "tool_use"]
+        result_ids = [block["tool_use_id"] for block in results["content"]]
+        if len(tool_use_ids) != TOOLS or tool_use_ids != result_ids:
+            problems.append(f"step {step + 1}: tool_use {tool_use_ids} vs tool_result {result_ids}")
+    return problems
+
+async def run() -> dict:
+    client = stub_client([tool_step(step) for step in range(1, STEPS + 1)] + [
+        SimpleNamespace(content=[text_block(FINAL_ANSWER)], stop_reason="end_turn"),
+    ])
+    client.session = SlowToolSession()
+    conversation = Conversation([{"role": "user", "content": "Show me strategies 0 to 3"}])
+    started = time.perf_counter()
+    answer = await client.process_antropic_query(conversation)
+    elapsed = time.perf_counter() - started
+    return {
+        "tools_per_step": TOOLS,
+        "steps": STEPS,
+        "tool_concurrency": TOOL_CONCURRENCY,
+        "model_calls": client.anthropic.messages.calls,
+        "elapsed_s": round(elapsed, 3),
+        "serialized_s": round(STEPS * TOOLS * TOOL_LATENCY, 3),
+        "answered": answer.endswith(FINAL_ANSWER),
+        "problems": check_history(conversation.messages),
+    }
+
+async def check_json_results() -> list:
+    client = stub_client([tool_step(1)])
+    client.session = CountingSession(redirect=True)
+    answer = await client.process_antropic_query([{"role": "user", "content": "Show me strategies 0 to 3"}])
+    expected = [{"type": "redirect", "data": "/plan"}] + [{"type": "text", "data": f"tool_{n} is active."} for n in range(1, TOOLS)]
+    return [] if answer == expected else [f"JSON step answered {answer!r}"]
+
+async def check_step_budget() -> list:
+    """A model asking for tools forever: only the steps before the last one run them."""
+    max_steps = client_module.MAX_AGENT_STEPS
+    client_module.MAX_AGENT_STEPS = 2
+    try:
+        client = stub_client([tool_step(1)])
+        client.session = CountingSession()
+        answer = await client.process_antropic_query([{"role": "user", "content": "Show me strategies 0 to 3"}])
+    finally:
+        client_module.MAX_AGENT_STEPS = max_steps
+    if client.session.calls != TOOLS or not answer.endswith("[Stopped after 2 steps]"):
+        return [f"{client.session.calls} tool calls in 2 steps, answer ending {answer[-40:]!r}"]
+    return []
+
+async def run_checks() -> list:
+    return await check_json_results() + await check_step_budget()
+
+def main():
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(run())
+    result["problems"] += asyncio.run(run_checks())
+    print(json.dumps(result, indent=2))
+    slots = min(TOOLS, TOOL_CONCURRENCY)
+    expected = STEPS * -(-TOOLS // slots) * TOOL_LATENCY
+    return 0 if result["elapsed_s"] < expected * 1.5 and result["answered"] and not result["problems"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""The client API run with --workers 1, 2, ... against a real MCP server and a mock model API
+(ANTHROPIC_BASE_URL, answering after --model_latency_ms), with the SQLite chat store. SESSIONS
+chat sessions send --messages messages each, concurrently. Every request can land on any
+worker, so the history and usage read back must hold every turn. A message with another
+loginCert must be refused, and the store file must be private and never hold the cert. Reports
+messages per second per worker count, exits 1 when a check failed.
+
+    python benchmarks/bench_api_workers.py --workers 1 2 4 --sessions 20 --messages 5
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+
+import httpx
+
+PATH = Path(__file__).resolve().parents[1]
+SERVER_PATH = PATH.parent / "mcp-server-demo"
+LOGIN_CERT = "bench-api-workers-login-cert"
+
+
+def mock_model_app(latency_ms: float):
+    """POST /v1/messages answering every request with a short text message"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    calls = {"count": 0}
+
+    @app.post("/v1/messages")
+    async def messages(request: dict):
+        await asyncio.sleep(latency_ms / 1000)
+        calls["count"] += 1
+        question = request["messages"][-1]["content"]
+        question = question if isinstance(question, str) else question[-1].get("text", "")
+        return {
+            "id": f"msg_{calls['count']}",
+            "type": "message",
+            "role": "assistant",
+            "model": request["model"],
+            "content": [{"type": "text", "text": f"Answer to: {question}"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 10, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 90},
+        }
+    return app
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Nothing listening on {port} after {timeout}s")
+
+def stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def chat(http: httpx.AsyncClient, messages: int) -> list:
+    problems = []
+    session_id = (await http.get("/chat/start", params={"loginCert": LOGIN_CERT})).json()["session_id"]
+    refused = await http.post(f"/chat/{session_id}/message", params={"loginCert": "another"}, json={"message": "Question"})
+    if refused.status_code != 403:
+        problems.append(f"{session_id}: a message with another loginCert got {refused.status_code}")
+    for n in range(messages):
+        response = await http.post(f"/chat/{session_id}/message", params={"loginCert": LOGIN_CERT}, json={"message": f"Question {n}"})
+        if response.status_code != 200:
+            problems.append(f"{session_id}: message {n} failed with {response.status_code} {response.text[:200]}")
+    history = (await http.get(f"/chat/{session_id}/history", params={"loginCert": LOGIN_CERT})).json()["messages"]
+    usage = (await http.get(f"/chat/{session_id}/usage", params={"loginCert": LOGIN_CERT})).json()["usage"]
+    questions = [message["content"] for message in history if message["role"] == "user"]
+    if questions != [f"Question {n}" for n in range(messages)]:
+        problems.append(f"{session_id}: history holds {questions}")
+    if usage["requests"] != messages:
+        problems.append(f"{session_id}: usage counts {usage['requests']} model calls for {messages} messages")
+    await http.delete(f"/chat/{session_id}", params={"loginCert": LOGIN_CERT})
+    return problems
+
+async def drive(port: int, sessions: int, messages: int) -> dict:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as http:
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(chat(http, messages) for _ in range(sessions)))
+        elapsed = time.perf_counter() - started
+    return {
+        "messages": sessions * messages,
+        "elapsed_s": round(elapsed, 2),
+        "messages_per_s": round(sessions * messages / elapsed, 2),
+        "problems": [problem for problems in outcomes for problem in problems],
+    }
+
+def check_store(store_path: Path) -> list:
+    problems = []
+    if store_path.stat().st_mode & 0o077:
+        problems.append(f"{store_path.name} is readable by others, mode {oct(store_path.stat().st_mode & 0o777)}")
+    for path in store_path.parent.glob(store_path.name + "*"):
+        if LOGIN_CERT.encode() in path.read_bytes():
+            problems.append(f"{path.name} holds the loginCert")
+    return problems
+
+def run_api(workers: int, args, env: dict) -> dict:
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_path = Path(store_dir) / "chat_sessions.db"
+        api = subprocess.Popen(
+            [sys.executable, str(PATH / "api.py"), "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(workers)],
+            cwd=PATH, stdout=sys.stderr, env={**env, "CHAT_STORE_PATH": str(store_path)},
+        )
+        try:
+            wait_for_port(args.port, api)
+            # Workers start one by one, leave them time to all accept connections
+            time.sleep(1 + workers)
+            result = {"workers": workers, **asyncio.run(drive(args.port, args.sessions, args.messages))}
+            result["problems"] += check_store(store_path)
+            return result
+        finally:
+            stop(api)
+
+def main():
+    parser = argparse.ArgumentParser(description="Client API throughput and session consistency per worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--model_latency_ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--mcp_port", type=int, default=8395)
+    parser.add_argument("--model_port", type=int, default=8396)
+    parser.add_argument("--mock_model", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mock_model:
+        import uvicorn
+        uvicorn.run(mock_model_app(args.model_latency_ms), host="127.0.0.1", port=args.model_port, log_level="warning")
+        return 0
+
+    logging.disable(logging.CRITICAL)
+    env = {
+        **os.environ,
+        "MCP_SERVER_URL": f"http://127.0.0.1:{args.mcp_port}",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{args.model_port}",
+        "ANTHROPIC_API_KEY": "benchmark",
+        "MODEL": "benchmark",
+        "CHAT_STORE": "sqlite",
+        "LOG_LEVEL": "WARNING",
+    }
+    server = subprocess.Popen(
+        [sys.executable, str(SERVER_PATH / "main.py"), "--mode", "http", "--port", str(args.mcp_port), "--tools", "demo_tool"],
+        cwd=SERVER_PATH, stdout=sys.stderr, env=env,
+    )
+    model = subprocess.Popen(
+        [sys.executable, __file__, "--mock_model", "--model_port", str(args.model_port), "--model_latency_ms", str(args.model_latency_ms)],
+        cwd=PATH, stdout=sys.stderr, env=env,
+    )
+    try:
+        wait_for_port(args.mcp_port, server)
+        wait_for_port(args.model_port, model)
+        runs = [run_api(workers, args, env) for workers in args.workers]
+    finally:
+        stop(server)
+        stop(model)
+    print(json.dumps({"sessions": args.sessions, "model_latency_ms": args.model_latency_ms, "runs": runs}, indent=2))
+    return 1 if any(run["problems"] for run in runs) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
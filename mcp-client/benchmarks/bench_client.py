@@ -0,0 +1,103 @@
+"""Micro-benchmarks of MCPClient.process_antropic_query with a stubbed Anthropic API and MCP
+session, offline, with JSON baselines.
+
+- a plain text answer over a 20 turn history
+- a tool_use answer: one tool call, then the follow-up request with the tool result
+
+    python benchmarks/bench_client.py              # print the results
+    python benchmarks/bench_client.py --save       # record them as benchmarks/baselines/client.json
+    python benchmarks/bench_client.py --compare    # exit 1 on a regression against the baseline
+"""
+import os
+import sys
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+from mcp import types
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# The harness is shared by the server and client benchmarks, in benchmarks/ at the repository root
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from benchmarks.harness import measure, report
+from client import MCPClient
+
+BASELINE = Path(__file__).parent / "baselines" / "client.json"
+HISTORY_TURNS = 20
+TOOLS = 9
+
+
+class StubMessages:
+    """Replays the scripted responses, one per messages.create call, in a loop."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return response
+
+
+class StubSession:
+    def __init__(self):
+        self.tools = types.ListToolsResult(tools=[
+            types.Tool(
+                name=f"tool_{n}",
+                description="Get Strategy details.\n\nArgs:\n    id: structureCode of the strategy",
+                inputSchema={
+                    "type": "object",
+                    "properties": {"id": {"type": "string"}, "PF_loginCert": {"type": "string", "default": None}},
+                    "required": ["id"],
+                },
+            )
+            for n in range(TOOLS)
+        ])
+
+    async def list_tools(self):
+        return self.tools
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None, progress_callback=None):
+        text = "Strategy 'Growth' (ID: 1) is a Portfolio currently in 'Active'."
+        return types.CallToolResult(content=[types.TextContent(type="text", text=text)])
+
+
+def text_block(text):
+    return SimpleNamespace(type="text", text=text)
+
+def history(turns: int) -> list:
+    messages = []
+    for n in range(turns):
+        messages.append({"role": "user", "content": f"Question {n}: " + "what is the status of the strategy? " * 10})
+        messages.append({"role": "assistant", "content": f"Answer {n}: " + "the strategy is active and on track. " * 10})
+    messages.append({"role": "user", "content": "Show me strategy 1"})
+    return messages
+
+def stub_client(responses) -> MCPClient:
+    client = MCPClient(PF_loginCert="benchmark")
+    client.anthropic = SimpleNamespace(messages=StubMessages(responses))
+    client.session = StubSession()
+    return client
+
+def main():
+    logging.disable(logging.CRITICAL)
+    messages = history(HISTORY_TURNS)
+
+    text_client = stub_client([SimpleNamespace(content=[text_block("Strategy 1 is active.")], stop_reason="end_turn")])
+    tool_use = SimpleNamespace(type="tool_use", id="toolu_1", name="tool_0", input={"id": "1"})
+    tool_client = stub_client([
+        SimpleNamespace(content=[text_block("Let me look it up."), tool_use], stop_reason="tool_use"),
+        SimpleNamespace(content=[text_block("Strategy 1 is active.")], stop_reason="end_turn"),
+    ])
+
+    results = {
+        "process_query_text": measure(lambda: text_client.process_antropic_query(messages), iterations=2_000, is_async=True),
+        "process_query_tool_use": measure(lambda: tool_client.process_antropic_query(messages), iterations=1_000, is_async=True),
+    }
+    return report(results, BASELINE)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""N concurrent /chat/{session_id}/message requests against the API, with a model stub that
+takes MODEL_LATENCY seconds per call. Non-blocking model calls finish in about one model latency,
+blocking ones would take the sum. Exits 1 when the requests were serialized.
+
+    python benchmarks/bench_concurrent_chat.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+import api
+from client import MCPClient
+from chat_store import MemoryChatStore
+from session_manager import SessionManager, hash_login_cert
+from benchmarks.bench_client import StubSession
+
+REQUESTS = 10
+MODEL_LATENCY = 0.5
+
+
+class SlowMessages:
+    async def create(self, **kwargs):
+        await asyncio.sleep(MODEL_LATENCY)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text="Strategy 1 is active.")], stop_reason="end_turn")
+
+
+async def open_session(session_id: str):
+    client = MCPClient(PF_loginCert="benchmark")
+    client.anthropic = SimpleNamespace(messages=SlowMessages())
+    client.session = StubSession()
+    await api.sessions.store.create(session_id, {"loginCertHash": hash_login_cert("benchmark")})
+    api.sessions[session_id] = api.ChatSession(messages=[], client=client)
+
+async def run() -> dict:
+    api.sessions = SessionManager(store=MemoryChatStore())
+    for n in range(REQUESTS):
+        await open_session(f"session-{n}")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            http.post(f"/chat/session-{n}/message", params={"loginCert": "benchmark"}, json={"message": "Show me strategy 1"}) for n in range(REQUESTS)
+        ))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": REQUESTS,
+        "ok": sum(1 for response in responses if response.status_code == 200),
+        "model_latency_s": MODEL_LATENCY,
+        "elapsed_s": round(elapsed, 3),
+        "serialized_s": REQUESTS * MODEL_LATENCY,
+    }
+
+def main():
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(run())
+    print(json.dumps(result, indent=2))
+    # Concurrent requests should take about one model latency, far from the serialized sum
+    return 0 if result["ok"] == REQUESTS and result["elapsed_s"] < 2 * MODEL_LATENCY else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Long synthetic conversations through the Conversation store: checks the trimming invariants
+and compares the per-turn cost with the previous deep copy of the whole history.
+
+Invariants, after every turn: the estimate stays within the budget (unless a single turn is
+larger), the history starts with a user turn and every tool_use has its tool_result right after.
+Trims bring the history down to the trim target, so the history prefix (what the prompt cache
+reuses) only changes on a small share of the turns. Exits 1 when one is broken.
+
+    python benchmarks/bench_conversation.py
+"""
+import sys
+import copy
+import json
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from conversation import Conversation, starts_turn
+
+TURNS = 2_000
+TOKEN_BUDGET = 20_000
+
+
+def synthetic_turn(n: int) -> list:
+    """One user question; every third one goes through a tool call before the answer."""
+    messages = [{"role": "user", "content": f"Question {n}: " + "how is the portfolio doing this quarter? " * 8}]
+    if n % 3 == 0:
+        messages.append({"role": "assistant", "content": [
+            {"type": "text", "text": "Let me look it up."},
+            {"type": "tool_use", "id": f"toolu_{n}", "name": "get_strategy_detail", "input": {"id": str(n)}},
+        ]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"toolu_{n}", "content": [{"type": "text", "text": "Strategy details " * 40}]},
+        ]})
+    messages.append({"role": "assistant", "content": f"Answer {n}: " + "the portfolio is on track. " * 12})
+    return messages
+
+def check(conversation: Conversation, turn_tokens: int) -> list[str]:
+    problems = []
+    messages = conversation.messages
+    if conversation.tokens > max(conversation.token_budget, turn_tokens):
+        problems.append(f"{conversation.tokens} tokens over the {conversation.token_budget} budget")
+    if messages and not starts_turn(messages[0]):
+        problems.append("history does not start with a user turn")
+    for index, message in enumerate(messages):
+        if isinstance(message["content"], list) and any(block.get("type") == "tool_use" for block in message["content"]):
+            following = messages[index + 1] if index + 1 < len(messages) else None
+            if following is None or following["content"][0].get("type") != "tool_result":
+                problems.append(f"tool_use at {index} lost its tool_result")
+    return problems
+
+def run_store() -> dict:
+    conversation = Conversation(token_budget=TOKEN_BUDGET)
+    problems = []
+    elapsed = 0.0
+    prefix_changes = 0
+    for n in range(TURNS):
+        before = conversation.tokens
+        started = time.perf_counter()
+        conversation.extend(synthetic_turn(n))
+        trimmed = conversation.trim()
+        elapsed += time.perf_counter() - started
+        prefix_changes += bool(trimmed)
+        problems.extend(check(conversation, conversation.tokens - before))
+    # Each trim frees (1 - trim_target) of the budget, that many turns go by before the next one
+    if prefix_changes > TURNS / 10:
+        problems.append(f"history prefix changed on {prefix_changes} of {TURNS} turns")
+    return {
+        "per_turn_us": round(elapsed / TURNS * 1e6, 2),
+        "messages_kept": len(conversation),
+        "tokens": conversation.tokens,
+        "trimmed_turns": conversation.trimmed_turns,
+        "prefix_changes": prefix_changes,
+        "problems": problems[:10],
+    }
+
+def run_deepcopy() -> dict:
+    """The previous behaviour: unbounded list, deep copied on every turn."""
+    messages = []
+    started = time.perf_counter()
+    for n in range(TURNS):
+        messages.extend(synthetic_turn(n))
+        copy.deepcopy(messages)
+    elapsed = time.perf_counter() - started
+    return {"per_turn_us": round(elapsed / TURNS * 1e6, 2), "messages_kept": len(messages)}
+
+def main():
+    results = {"turns": TURNS, "token_budget": TOKEN_BUDGET, "conversation": run_store(), "deepcopy_history": run_deepcopy()}
+    print(json.dumps(results, indent=2))
+    return 1 if results["conversation"]["problems"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Drives SessionManager through the API with stubbed clients: more sessions than max_sessions,
+each chatting TURNS turns, then a TTL expiry. Reports the registry stats and checks that the
+least recently used idle sessions were closed, busy ones kept, and history stayed under its cap.
+The messages go without loginCert, the sessions being open in this worker. Also checks that a
+worker sharing the store cannot reopen, read or end a session without its loginCert, and that a
+wrong cert is always refused. Exits 1 when a check failed.
+
+    python benchmarks/bench_session_manager.py
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("CHAT_HISTORY_TOKENS", "2000")
+
+import api
+from client import MCPClient
+from chat_store import MemoryChatStore
+from session_manager import CHAT_HISTORY_TOKENS, ChatSession, SessionManager, hash_login_cert
+from benchmarks.bench_client import StubMessages, StubSession, text_block
+
+SESSIONS = 60
+MAX_SESSIONS = 50
+TURNS = 30
+
+
+class CountingClient(MCPClient):
+    closed = 0
+
+    async def cleanup(self):
+        CountingClient.closed += 1
+        await super().cleanup()
+
+
+def open_session(session_id: str):
+    client = CountingClient(PF_loginCert="benchmark")
+    answer = "The strategy is active and on track, " * 20
+    client.anthropic = SimpleNamespace(messages=StubMessages([SimpleNamespace(content=[text_block(answer)], stop_reason="end_turn")]))
+    client.session = StubSession()
+    api.sessions[session_id] = ChatSession(messages=[], client=client)
+
+async def run() -> dict:
+    problems = []
+    api.sessions = SessionManager(ttl=3600, max_sessions=MAX_SESSIONS)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+        busy = None
+        for n in range(SESSIONS):
+            open_session(f"session-{n}")
+            if n == 0:
+                # Held busy as if mid-request: never evicted although least recently used
+                busy = api.sessions["session-0"].using()
+                busy.__enter__()
+            for turn in range(TURNS):
+                response = await http.post(f"/chat/session-{n}/message", json={"message": f"Question {turn}: how is the strategy doing?"})
+                if response.status_code != 200:
+                    problems.append(f"session-{n}: a message without loginCert got {response.status_code}")
+        await asyncio.sleep(0)
+        stats = (await http.get("/sessions/stats")).json()
+
+        if stats["sessions"] != MAX_SESSIONS or stats["evicted"] != SESSIONS - MAX_SESSIONS:
+            problems.append(f"{stats['sessions']} sessions open, {stats['evicted']} evicted")
+        if "session-0" not in api.sessions or "session-1" in api.sessions:
+            problems.append("the busy session was evicted, or the least recently used one was kept")
+        if stats["history_tokens"] > MAX_SESSIONS * CHAT_HISTORY_TOKENS:
+            problems.append(f"{stats['history_tokens']} history tokens over the cap of {CHAT_HISTORY_TOKENS} per session")
+
+        busy.__exit__(None, None, None)
+        api.sessions.ttl = 0
+        expired = api.sessions.expire()
+        await asyncio.gather(*api.sessions._closing)
+        if expired != MAX_SESSIONS or len(api.sessions):
+            problems.append(f"{expired} sessions expired, {len(api.sessions)} left")
+        if CountingClient.closed != SESSIONS:
+            problems.append(f"{CountingClient.closed} of {SESSIONS} clients closed")
+    return {"stats_before_expiry": stats, "clients_closed": CountingClient.closed, "problems": problems}
+
+async def refused(call) -> bool:
+    try:
+        await call
+    except PermissionError:
+        return True
+    except Exception:
+        # Got past the check, e.g. reconnecting to the (absent) MCP server
+        return False
+    return False
+
+async def check_login_cert() -> list:
+    """Two workers sharing a store, the session open in the first one only"""
+    problems = []
+    store = MemoryChatStore()
+    owner, other = SessionManager(store=store), SessionManager(store=store)
+    await store.create("shared", {"loginCertHash": hash_login_cert("benchmark")})
+    owner["shared"] = ChatSession(messages=[], client=CountingClient(PF_loginCert="benchmark"))
+    if await owner.get("shared") is None or await owner.load("shared") is None:
+        problems.append("the worker holding the session refused it without loginCert")
+    if not await refused(owner.get("shared", "another")):
+        problems.append("the worker holding the session accepted another loginCert")
+    for name, call in (("reopened", other.get("shared")), ("read", other.load("shared")), ("ended", other.end("shared"))):
+        if not await refused(call):
+            problems.append(f"another worker {name} the session without loginCert")
+    if not await refused(other.end("shared", "another")):
+        problems.append("another worker ended the session with another loginCert")
+    if await other.load("shared", "benchmark") is None or not await owner.end("shared"):
+        problems.append("the session could not be read with its loginCert or ended by its worker")
+    return problems
+
+def main():
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(run())
+    result["problems"] += asyncio.run(check_login_cert())
+    print(json.dumps(result, indent=2))
+    return 1 if result["problems"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
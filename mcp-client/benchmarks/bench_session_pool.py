@@ -0,0 +1,124 @@
+"""Session-less requests against a real MCP server (started here with streamable HTTP on
+--port), with a stubbed model that asks for one tool call: a new MCPClient per request (connect,
+initialize, list tools, call, cleanup) against a lease from MCPClientPool. Also checks that a
+broken idle session is replaced. Exits 1 when the pool is not faster or a check failed.
+
+    python benchmarks/bench_session_pool.py --requests 50 --concurrency 5
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import logging
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+PATH = Path(__file__).resolve().parents[1]
+SERVER_PATH = PATH.parent / "mcp-server-demo"
+sys.path.append(str(PATH))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+
+def stub_model(client):
+    from benchmarks.bench_client import StubMessages, text_block
+    tool_use = SimpleNamespace(type="tool_use", id="toolu_1", name="substract", input={"a": 5, "b": 2})
+    client.anthropic = SimpleNamespace(messages=StubMessages([
+        SimpleNamespace(content=[tool_use], stop_reason="tool_use"),
+        SimpleNamespace(content=[text_block("5 - 2 = 3")], stop_reason="end_turn"),
+    ]))
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Nothing listening on {port} after {timeout}s")
+
+async def run_requests(handle, requests: int, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        async with slots:
+            return await handle(n)
+    started = time.perf_counter()
+    answers = await asyncio.gather(*(one(n) for n in range(requests)))
+    assert all("3" in str(answer) for answer in answers), answers
+    return time.perf_counter() - started
+
+async def run(requests: int, concurrency: int) -> dict:
+    from client import MCPClient
+    from session_pool import MCPClientPool
+
+    async def fresh_client(n):
+        client = MCPClient(PF_loginCert="benchmark")
+        stub_model(client)
+        await client.connect_to_mcp_server_streamable_http_transport()
+        try:
+            return await client.process_antropic_query("What is 5 - 2?")
+        finally:
+            await client.cleanup()
+
+    pool = MCPClientPool(size=concurrency, warm=concurrency)
+    await pool.start()
+
+    async def pooled_client(n):
+        async with pool.lease(PF_loginCert="benchmark") as client:
+            stub_model(client)
+            return await client.process_antropic_query("What is 5 - 2?")
+
+    try:
+        fresh_s = await run_requests(fresh_client, requests, concurrency)
+        pooled_s = await run_requests(pooled_client, requests, concurrency)
+        # A session that broke while idle is replaced on the next lease
+        await pool._idle[-1].close()
+        replaced_before = pool.replaced
+        await run_requests(pooled_client, 1, 1)
+        stats = pool.stats()
+    finally:
+        await pool.close()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "fresh_client_ms": round(fresh_s / requests * 1000, 2),
+        "pooled_ms": round(pooled_s / requests * 1000, 2),
+        "pool": stats,
+        "replaced_broken_session": stats["replaced"] == replaced_before + 1,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fresh MCP client per request vs a pooled session")
+    parser.add_argument("--port", type=int, default=8392)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    os.environ["MCP_SERVER_URL"] = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, str(SERVER_PATH / "main.py"), "--mode", "http", "--port", str(args.port), "--tools", "demo_tool"],
+        cwd=SERVER_PATH, stdout=sys.stderr, env={**os.environ, "LOG_LEVEL": "WARNING"},
+    )
+    try:
+        wait_for_port(args.port, server)
+        result = asyncio.run(run(args.requests, args.concurrency))
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    print(json.dumps(result, indent=2))
+    return 0 if result["pooled_ms"] < result["fresh_client_ms"] and result["replaced_broken_session"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Streamed query with a model stub that generates DELTAS text deltas DELTA_LATENCY seconds apart
+and asks for one slow tool reporting progress, then answers. Reports the time to the first
+event against the total, and checks /chat/{session_id}/message/stream: the event sequence and
+the history afterwards. Exits 1 when the first event waited for the whole answer or a check failed.
+
+    python benchmarks/bench_stream_chat.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+from mcp import types
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+import api
+from client import MCPClient
+from chat_store import MemoryChatStore
+from session_manager import SessionManager, hash_login_cert
+from benchmarks.bench_client import StubSession, text_block
+
+DELTAS = 10
+DELTA_LATENCY = 0.02
+TOOL_LATENCY = 0.3
+PROGRESS_STEPS = 3
+
+
+class StubStream:
+    def __init__(self, response):
+        self.response = response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for block in self.response.content:
+            if block.type != "text":
+                continue
+            words = block.text.split(" ")
+            size = -(-len(words) // DELTAS)
+            for start in range(0, len(words), size):
+                await asyncio.sleep(DELTA_LATENCY)
+                yield SimpleNamespace(type="text", text=" ".join(words[start:start + size]) + " ")
+
+    async def get_final_message(self):
+        return self.response
+
+
+class StubStreamingMessages:
+    """messages.stream replaying the scripted responses, one per call, in a loop."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = 0
+
+    def stream(self, **kwargs):
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return StubStream(response)
+
+
+class ProgressSession(StubSession):
+    async def call_tool(self, name, arguments, read_timeout_seconds=None, progress_callback=None):
+        for step in range(1, PROGRESS_STEPS + 1):
+            await asyncio.sleep(TOOL_LATENCY / PROGRESS_STEPS)
+            await progress_callback(step, PROGRESS_STEPS, f"step {step}")
+        return types.CallToolResult(content=[types.TextContent(type="text", text="Strategy 1 is active.")])
+
+
+FINAL_ANSWER = "Strategy 1 is active and on track, with no open risks at the moment."
+
+def stub_client() -> MCPClient:
+    usage = SimpleNamespace(input_tokens=100, output_tokens=20, cache_creation_input_tokens=0, cache_read_input_tokens=80)
+    tool_use = SimpleNamespace(type="tool_use", id="toolu_1", name="tool_0", input={"id": "1"})
+    client = MCPClient(PF_loginCert="benchmark")
+    client.anthropic = SimpleNamespace(messages=StubStreamingMessages([
+        SimpleNamespace(content=[text_block("Let me look up strategy 1 in Planview for you right now."), tool_use], stop_reason="tool_use", usage=usage),
+        SimpleNamespace(content=[text_block(FINAL_ANSWER)], stop_reason="end_turn", usage=usage),
+    ]))
+    client.session = ProgressSession()
+    return client
+
+async def time_to_first_event() -> dict:
+    client = stub_client()
+    started = time.perf_counter()
+    first = None
+    types_seen = []
+    async for event in client.query_events([{"role": "user", "content": "Show me strategy 1"}]):
+        if first is None:
+            first = time.perf_counter() - started
+        types_seen.append(event["type"])
+    return {
+        "first_event_s": round(first, 3),
+        "total_s": round(time.perf_counter() - started, 3),
+        "events": {event_type: types_seen.count(event_type) for event_type in dict.fromkeys(types_seen)},
+        "usage": client.usage,
+    }
+
+async def check_endpoint() -> list:
+    problems = []
+    api.sessions = SessionManager(store=MemoryChatStore())
+    await api.sessions.store.create("stream", {"loginCertHash": hash_login_cert("benchmark")})
+    api.sessions["stream"] = api.ChatSession(messages=[], client=stub_client())
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+        response = await http.post("/chat/stream/message/stream", params={"loginCert": "benchmark"}, json={"message": "Show me strategy 1"})
+        history = (await http.get("/chat/stream/history")).json()["messages"]
+    events = [json.loads(line) for line in response.text.splitlines()]
+    if response.headers["content-type"] != api.NDJSON:
+        problems.append(f"content-type {response.headers['content-type']}")
+    kinds = [event["type"] for event in events]
+    if kinds[-1] != "done" or "tool_start" not in kinds or kinds.count("progress") != PROGRESS_STEPS:
+        problems.append(f"events {kinds}")
+    if kinds.index("tool_start") > kinds.index("progress") or kinds.index("tool_end") < kinds.index("progress"):
+        problems.append(f"tool events out of order {kinds}")
+    streamed = "".join(event["text"] for event in events if event["type"] == "text")
+    if "Strategy 1 is active" not in streamed:
+        problems.append(f"streamed text {streamed!r}")
+    if [message["role"] for message in history] != ["user", "assistant", "user", "assistant"]:
+        problems.append(f"history roles {[message['role'] for message in history]}")
+    elif history[-1]["content"] != FINAL_ANSWER or not events[-1]["response"].endswith(FINAL_ANSWER):
+        problems.append(f"history ends with {history[-1]['content']!r} instead of the last step's answer")
+    await api.sessions.end("stream")
+    return problems
+
+def main():
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(time_to_first_event())
+    result["problems"] = asyncio.run(check_endpoint())
+    print(json.dumps(result, indent=2))
+    return 0 if result["first_event_s"] < result["total_s"] / 4 and not result["problems"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
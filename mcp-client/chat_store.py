@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Where chat sessions live: "sqlite" (shared by the workers of one host) or "memory" (one worker only)
+CHAT_STORE = os.getenv("CHAT_STORE", "sqlite")
+CHAT_STORE_PATH = os.getenv("CHAT_STORE_PATH", str(Path(__file__).resolve().parent / "chat_sessions.db"))
+# Seconds without a message before a stored session is deleted
+CHAT_STORE_TTL = float(os.getenv("CHAT_STORE_TTL", str(7 * 24 * 3600)))
+
+USAGE_FIELDS = ("requests", "input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+@dataclass
+class StoredSession:
+    session_id: str
+    metadata: Dict[str, Any]
+    # None when the caller already has this version of the history
+    messages: Optional[List[Dict[str, Any]]]
+    usage: Dict[str, int]
+    version: int
+    updated: float = field(default_factory=time.time)
+
+
+def add_usage(total: Dict[str, int], delta: Dict[str, int]) -> Dict[str, int]:
+    return {name: total.get(name, 0) + delta.get(name, 0) for name in USAGE_FIELDS}
+
+
+class ChatStore(ABC):
+    """History and metadata of the chat sessions, shared by every worker of the API.
+
+    Each save bumps the session's version, so a worker holding a session knows when another
+    worker answered in it meanwhile. Concurrent messages in one session: the last save wins.
+    """
+
+    # Whether several processes see the same sessions
+    shared = False
+
+    @abstractmethod
+    async def create(self, session_id: str, metadata: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    async def load(self, session_id: str, known_version: Optional[int] = None) -> Optional[StoredSession]:
+        """The session, without its messages when they are still at `known_version`"""
+
+    @abstractmethod
+    async def save(self, session_id: str, messages: List[Dict[str, Any]], usage: Dict[str, int]) -> Optional[int]:
+        """Replace the history and add `usage` to the session's, returns the new version (None
+        when the session was deleted meanwhile)"""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def purge(self, idle_seconds: float) -> int:
+        """Delete the sessions without a message for `idle_seconds`, returns how many"""
+
+    async def close(self):
+        pass
+
+
+class MemoryChatStore(ChatStore):
+    """Sessions in this process only, for a single worker."""
+
+    def __init__(self):
+        self._sessions: Dict[str, StoredSession] = {}
+
+    async def create(self, session_id, metadata):
+        self._sessions[session_id] = StoredSession(session_id, dict(metadata), [], {}, 0)
+
+    async def load(self, session_id, known_version=None):
+        stored = self._sessions.get(session_id)
+        if stored is None:
+            return None
+        messages = None if stored.version == known_version else list(stored.messages)
+        return StoredSession(stored.session_id, stored.metadata, messages, stored.usage, stored.version, stored.updated)
+
+    async def save(self, session_id, messages, usage):
+        stored = self._sessions.get(session_id)
+        if stored is None:
+            return None
+        stored.messages = list(messages)
+        stored.usage = add_usage(stored.usage, usage)
+        stored.version += 1
+        stored.updated = time.time()
+        return stored.version
+
+    async def delete(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    async def purge(self, idle_seconds):
+        deadline = time.time() - idle_seconds
+        expired = [session_id for session_id, stored in self._sessions.items() if stored.updated < deadline]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+
+class SQLiteChatStore(ChatStore):
+    """Sessions in a local SQLite file (WAL mode), shared by the workers of one host.
+
+    Queries run in worker threads, one connection per thread, so the event loop never waits on
+    the disk.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            metadata TEXT NOT NULL,
+            messages TEXT NOT NULL,
+            usage TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated);
+    """
+
+    def __init__(self, path: str = CHAT_STORE_PATH):
+        self.path = path
+        # The histories are private: owner only, SQLite gives its -wal and -shm files the same mode
+        if not os.path.exists(path):
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit, writes open their own transaction
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self.SCHEMA)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    async def create(self, session_id, metadata):
+        def create():
+            now = time.time()
+            self._connection().execute(
+                "INSERT INTO chat_sessions VALUES (?, ?, '[]', '{}', 0, ?, ?)",
+                (session_id, json.dumps(metadata), now, now),
+            )
+        await self._run(create)
+
+    async def load(self, session_id, known_version=None):
+        def load():
+            row = self._connection().execute(
+                "SELECT metadata, usage, version, updated, CASE WHEN version = ? THEN NULL ELSE messages END"
+                " FROM chat_sessions WHERE session_id = ?",
+                (known_version, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            metadata, usage, version, updated, messages = row
+            return StoredSession(
+                session_id, json.loads(metadata), json.loads(messages) if messages is not None else None,
+                json.loads(usage), version, updated,
+            )
+        return await self._run(load)
+
+    async def save(self, session_id, messages, usage):
+        data = json.dumps(messages, default=str)
+
+        def save():
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT usage, version FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    connection.execute("ROLLBACK")
+                    return None
+                version = row[1] + 1
+                connection.execute(
+                    "UPDATE chat_sessions SET messages = ?, usage = ?, version = ?, updated = ? WHERE session_id = ?",
+                    (data, json.dumps(add_usage(json.loads(row[0]), usage)), version, time.time(), session_id),
+                )
+                connection.execute("COMMIT")
+                return version
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return await self._run(save)
+
+    async def delete(self, session_id):
+        def delete():
+            return self._connection().execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+        return await self._run(delete)
+
+    async def purge(self, idle_seconds):
+        def purge():
+            return self._connection().execute(
+                "DELETE FROM chat_sessions WHERE updated < ?", (time.time() - idle_seconds,)
+            ).rowcount
+        return await self._run(purge)
+
+    async def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+CHAT_STORES = {
+    "sqlite": SQLiteChatStore,
+    "memory": MemoryChatStore,
+}
+
+def get_chat_store(kind: str = CHAT_STORE) -> ChatStore:
+    if kind not in CHAT_STORES:
+        raise ValueError(f"Unknown chat store {kind!r}, expected one of {', '.join(CHAT_STORES)}")
+    return CHAT_STORES[kind]()
@@ -1,30 +1,117 @@
 import json
-import copy
 import os
+import sys
+import time
 import asyncio
-from typing import Optional, List, Dict
-from contextlib import AsyncExitStack
+import logging
+from datetime import timedelta
+from typing import Optional, List, Dict, Callable, Awaitable, AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
 
-from mcp.types import TextContent, ClientResult, CreateMessageResult
+from mcp.types import TextContent, ClientResult, CreateMessageResult, ServerNotification, ToolListChangedNotification
 from mcp import ClientSession, StdioServerParameters, CreateMessageResult
 from mcp.client.stdio import stdio_client
 from mcp.client.streamable_http import streamablehttp_client
 
-from anthropic import Anthropic
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 
+from conversation import Conversation
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()  # load environment variables from .env
 SERVER_SCRIPT_PATH = os.getenv("SERVER_SCRIPT_PATH")
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL")
 MODEL = os.getenv("MODEL")
+# One pooled connection set to the model API for every session of the process
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "100"))
+ANTHROPIC_MAX_KEEPALIVE = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE", "20"))
+# Max model calls in flight across all sessions, the rest wait for a slot
+ANTHROPIC_CONCURRENCY = int(os.getenv("ANTHROPIC_CONCURRENCY", "16"))
+SYSTEM_PROMPT = os.getenv(
+    "SYSTEM_PROMPT",
+    "you are like a global search with enhanced context. The enhanced context is provided to you via the mcp tools registered",
+)
+# Cache breakpoints on the tools, the system prompt and the history, so repeat turns reuse the prefix
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "true").lower() == "true"
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Tool calls of one session running at once, when the model asks for several in one response
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+# Model calls per query (each one may ask for tools) and seconds before the tool loop is cut short
+MAX_AGENT_STEPS = int(os.getenv("MAX_AGENT_STEPS", "10"))
+AGENT_TIME_BUDGET = float(os.getenv("AGENT_TIME_BUDGET", "120"))
+
+# Receives the events of a streamed query, see MCPClient.query_events
+EventHandler = Callable[[Dict], Awaitable[None]]
+# Receives (tool_name, progress, total, message) for every progress notification sent by a tool
+ProgressHandler = Callable[[str, float, Optional[float], Optional[str]], Awaitable[None]]
+
+_anthropic: Optional[AsyncAnthropic] = None
+_model_slots: Optional[asyncio.Semaphore] = None
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """The process wide async model client, sharing one pooled HTTP transport between sessions."""
+    global _anthropic
+    if _anthropic is None:
+        limits = httpx.Limits(
+            max_connections=ANTHROPIC_MAX_CONNECTIONS,
+            max_keepalive_connections=min(ANTHROPIC_MAX_KEEPALIVE, ANTHROPIC_MAX_CONNECTIONS),
+        )
+        _anthropic = AsyncAnthropic(http_client=DefaultAsyncHttpxClient(limits=limits))
+    return _anthropic
+
+async def close_anthropic_client():
+    global _anthropic
+    if _anthropic is not None:
+        await _anthropic.close()
+        _anthropic = None
+
+@asynccontextmanager
+async def model_slot():
+    """Hold one of the ANTHROPIC_CONCURRENCY model call slots."""
+    global _model_slots
+    if _model_slots is None:
+        _model_slots = asyncio.Semaphore(ANTHROPIC_CONCURRENCY)
+    async with _model_slots:
+        yield
+
+def with_cache_breakpoint(messages: List[Dict]) -> List[Dict]:
+    """The messages to send, with a cache breakpoint on the last block, so the next request reads
+    everything up to here from the cache. The history itself is not modified."""
+    if not messages:
+        return messages
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    else:
+        blocks = list(content)
+        blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+    return messages[:-1] + [{**last, "content": blocks}]
 
 class MCPClient:
-    def __init__(self, PF_loginCert = None):
+    def __init__(self, PF_loginCert = None, progress_handler: Optional[ProgressHandler] = None):
         self.PF_loginCert = PF_loginCert
+        self.progress_handler = progress_handler or self.log_tool_progress
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.anthropic = get_anthropic_client()
+        # Tools converted for the model API, kept until the server says the list changed
+        self._tools: Optional[List[Dict]] = None
+        self._tools_version = 0
+        self._tool_slots = asyncio.Semaphore(TOOL_CONCURRENCY)
+        # Token counts of every model call made for this client, cache reads vs writes included
+        self.usage = {
+            "requests": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
 
     # methods will go here
 
@@ -34,7 +121,7 @@ class MCPClient:
             server_script_path: Path to the server script (.py or .js)
         """
         server_script_path = SERVER_SCRIPT_PATH
-        print(server_script_path)
+        logger.debug("Starting MCP server %s", server_script_path)
         is_python = server_script_path.endswith(".py")
         is_js = server_script_path.endswith(".js")
         if not (is_python or is_js):
@@ -50,7 +137,7 @@ class MCPClient:
         )
         self.stdio, self.write = stdio_transport
         self.session = await self.exit_stack.enter_async_context(
-            ClientSession(self.stdio, self.write, sampling_callback=self.sampling_callback)
+            ClientSession(self.stdio, self.write, sampling_callback=self.sampling_callback, message_handler=self.message_handler)
         )
 
         # Client sends initialize request with protocol version and capabilities
@@ -60,9 +147,8 @@ class MCPClient:
         await self.session.initialize()
 
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
+        tools = await self.get_available_tools()
+        logger.info("Connected to server with tools: %s", [tool["name"] for tool in tools])
 
     async def connect_to_mcp_server_streamable_http_transport(self):
         """Connect to an MCP serve
@@ -74,7 +160,7 @@ class MCPClient:
         )
         receive_stream, send_stream, _ = steamable_http_transport
         self.session = await self.exit_stack.enter_async_context(
-            ClientSession(receive_stream, send_stream, sampling_callback=self.sampling_callback)
+            ClientSession(receive_stream, send_stream, sampling_callback=self.sampling_callback, message_handler=self.message_handler)
         )
 
         # Client sends initialize request with protocol version and capabilities
@@ -84,99 +170,254 @@ class MCPClient:
         await self.session.initialize()
 
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
+        tools = await self.get_available_tools()
+        logger.info("Connected to server with tools: %s", [tool["name"] for tool in tools])
     
     async def get_available_tools(self):
+        """Tools in the model API format. Listed once per session and reused on every turn,
+        until the server sends notifications/tools/list_changed."""
+        if self._tools is not None:
+            return self._tools
+        version = self._tools_version
         response = await self.session.list_tools()
-        tools = response.tools
-        return [
+        tools = [
             {
                 "name": tool.name,
                 "description": tool.description,
                 "input_schema": tool.inputSchema,
             }
-            for tool in tools
+            for tool in response.tools
         ]
+        if PROMPT_CACHING and tools:
+            # The tool definitions come first in the prompt, a breakpoint on the last one caches them all
+            tools[-1]["cache_control"] = CACHE_CONTROL
+        # A list_changed that arrived meanwhile makes this list stale already
+        if version == self._tools_version:
+            self._tools = tools
+        return tools
+
+    async def message_handler(self, message):
+        """Server notifications and unhandled messages of the MCP session"""
+        if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+            logger.info("Server tool list changed, it will be listed again on the next turn")
+            self._tools = None
+            self._tools_version += 1
+        elif isinstance(message, Exception):
+            logger.warning("MCP session error: %r", message)
+
+    async def process_antropic_query(self, messages, emit: Optional[EventHandler] = None) -> str:
+        """Process a query using Claude and available tools
 
-    async def process_antropic_query(self, messages) -> str:
-        """Process a query using Claude and available tools"""
-        messages_copy = copy.deepcopy(messages)
+        `messages` is a Conversation, which receives the tool exchange of this query then its answer:
+        the text of the last step, or the JSON payloads. The returned text also has the text of the
+        earlier steps and the tool calls. A plain list of messages (or a single user query string)
+        is left untouched.
+
+        The model is called again with the tool results until it stops asking for tools, at most
+        MAX_AGENT_STEPS times and for AGENT_TIME_BUDGET seconds. The tools asked for in one
+        response run concurrently, TOOL_CONCURRENCY at a time. When tools return JSON for the
+        caller, the query ends with those payloads instead of a text answer, see `json_payloads`.
+
+        With `emit`, the model answer is streamed and `emit` receives the events of the query as
+        they happen, see `query_events`.
+        """
+        conversation = self.as_conversation(messages)
+        conversation.trim()
         available_tools = await self.get_available_tools()
-        response = await self.send_request_to_antropic(messages_copy, available_tools)
+        deadline = time.monotonic() + AGENT_TIME_BUDGET
 
-        # Process response and handle tool calls
         final_text = []
-        assistant_message_content = []
-        for content in response.content:
-            if content.type == "text":
-                final_text.append(content.text)
-                assistant_message_content.append(content)
-            elif content.type == "tool_use":
-                tool_name = content.name
-                tool_args = content.input
-                tool_args["PF_loginCert"] = self.PF_loginCert
-
-
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)
-                
-                # Taking the first result content will only work if the tool returns a single result
-                first_result_content = result.content[0].text
-                is_json = self.is_string_json(first_result_content)
-                if is_json:
-                    return json.loads(first_result_content)
-                else:
-                    final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-                    assistant_message_content.append(content)
-                    messages_copy.append(
-                        {"role": "assistant", "content": assistant_message_content}
-                    )
-                    messages_copy.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "tool_result",
-                                    "tool_use_id": content.id,
-                                    "content": result.content,
-                                }
-                            ],
-                        }
+        # Text of the last step, all the history keeps of the answer
+        answer = []
+        for step in range(1, MAX_AGENT_STEPS + 1):
+            if emit:
+                response = await self.stream_request_to_antropic(conversation.messages, available_tools, emit)
+            else:
+                response = await self.send_request_to_antropic(conversation.messages, available_tools)
+
+            assistant_message_content = []
+            tool_uses = []
+            answer = []
+            for content in response.content:
+                if content.type == "text":
+                    final_text.append(content.text)
+                    answer.append(content.text)
+                    assistant_message_content.append({"type": "text", "text": content.text})
+                elif content.type == "tool_use":
+                    tool_uses.append(content)
+                    assistant_message_content.append(
+                        {"type": "tool_use", "id": content.id, "name": content.name, "input": content.input}
                     )
+            if response.stop_reason != "tool_use" or not tool_uses:
+                break
+
+            if step == MAX_AGENT_STEPS:
+                # Tools run now would have their results thrown away
+                logger.warning("Agent stopped after %d steps with tool calls pending", MAX_AGENT_STEPS)
+                final_text.append(f"[Stopped after {MAX_AGENT_STEPS} steps]")
+                answer.append(final_text[-1])
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Agent time budget of %ss used up after %d step(s)", AGENT_TIME_BUDGET, step)
+                final_text.append(f"[Stopped after {step} step(s): time budget of {AGENT_TIME_BUDGET:g}s used up]")
+                answer.append(final_text[-1])
+                break
+            if len(tool_uses) == 1:
+                results = [await self.call_tool(tool_uses[0], remaining, emit)]
+            else:
+                results = await asyncio.gather(*(self.call_tool(content, remaining, emit) for content in tool_uses))
 
-                    # Get next response from Claude
-                    response = await self.send_request_to_antropic(messages_copy, available_tools)
-                    final_text.append(response.content[0].text)
+            tool_results = []
+            for content, result in zip(tool_uses, results):
+                if isinstance(result, Exception):
+                    logger.warning("Tool %s failed: %r", content.name, result)
+                    tool_results.append(
+                        {"type": "tool_result", "tool_use_id": content.id, "content": f"Tool call failed: {result}", "is_error": True}
+                    )
+                    continue
+                final_text.append(f"[Calling tool {content.name} with args {content.input}]")
+                tool_results.append(
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": content.id,
+                        "content": [
+                            {"type": "text", "text": item.text} for item in result.content if item.type == "text"
+                        ],
+                        **({"is_error": True} if result.isError else {}),
+                    }
+                )
+            payloads = self.json_payloads(tool_results)
+            if payloads is not None:
+                conversation.append({"role": "assistant", "content": json.dumps(payloads)})
+                return payloads
+            conversation.append({"role": "assistant", "content": assistant_message_content})
+            conversation.append({"role": "user", "content": tool_results})
+        if any(answer):
+            conversation.append({"role": "assistant", "content": "\n".join(answer)})
         return "\n".join(final_text)
 
+    async def query_events(self, messages) -> AsyncIterator[Dict]:
+        """process_antropic_query as a stream of events, for the streaming chat endpoints:
+
+        - text: a text delta of the model, as it is generated
+        - tool_start / tool_end: a tool call of the model, with its arguments / its outcome
+        - progress: a progress notification of a running tool
+        - done: the last event, with the `response` process_antropic_query returns
+        - error: the query failed, with a `detail`, instead of done
+        """
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def run():
+            try:
+                response = await self.process_antropic_query(messages, emit=events.put)
+            except Exception as e:
+                logger.exception("Streamed query failed")
+                await events.put({"type": "error", "detail": str(e)})
+            else:
+                await events.put({"type": "done", "response": response})
+
+        query = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event["type"] in ("done", "error"):
+                    break
+        finally:
+            # The consumer went away (e.g. the HTTP client disconnected): stop the query
+            query.cancel()
+
+    async def call_tool(self, content, timeout: float, emit: Optional[EventHandler] = None):
+        """Run one tool_use block, within the session's TOOL_CONCURRENCY slots. Failures are
+        returned rather than raised, so the other tools of the step still report back."""
+        # The history keeps the model's arguments, the credentials are only added to the call
+        tool_args = {**content.input, "PF_loginCert": self.PF_loginCert}
+        if emit:
+            await emit({"type": "tool_start", "id": content.id, "tool": content.name, "input": content.input})
+            progress_callback = self.tool_progress_emitter(content, emit)
+        else:
+            progress_callback = self.tool_progress_callback(content.name)
+        try:
+            async with self._tool_slots:
+                result = await self.session.call_tool(
+                    content.name,
+                    tool_args,
+                    read_timeout_seconds=timedelta(seconds=timeout),
+                    progress_callback=progress_callback,
+                )
+        except Exception as e:
+            result = e
+        if emit:
+            failed = isinstance(result, Exception) or bool(result.isError)
+            await emit({"type": "tool_end", "id": content.id, "tool": content.name, "is_error": failed})
+        return result
+
+    @staticmethod
+    def as_conversation(messages) -> Conversation:
+        if isinstance(messages, Conversation):
+            return messages
+        if isinstance(messages, str):
+            return Conversation([{"role": "user", "content": messages}])
+        # Appending to a shallow copy leaves the caller's list as it was
+        return Conversation(list(messages))
+
     async def send_request_to_antropic(self, messages, available_tools: List[Dict[str, str]]=None):
-        if available_tools:
-            # Initial Claude API call
-            response = self.anthropic.messages.create(
-                model=MODEL,
-                max_tokens=1000,
-                messages=messages,
-                tools=available_tools,
-            )
+        return await self.create_message(**self.model_request(messages, available_tools))
+
+    async def stream_request_to_antropic(self, messages, available_tools: List[Dict[str, str]], emit: EventHandler):
+        """send_request_to_antropic, emitting the text deltas of the answer as they arrive"""
+        async with model_slot():
+            async with self.anthropic.messages.stream(**self.model_request(messages, available_tools)) as stream:
+                async for event in stream:
+                    if event.type == "text":
+                        await emit({"type": "text", "text": event.text})
+                response = await stream.get_final_message()
+        self.record_usage(response.usage)
+        return response
+
+    @staticmethod
+    def model_request(messages, available_tools: List[Dict[str, str]]=None) -> Dict:
+        """Arguments of a model call on `messages`, with the prompt cache breakpoints"""
+        request = {"model": MODEL, "max_tokens": 1000}
+        if PROMPT_CACHING:
+            request["system"] = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+            request["messages"] = with_cache_breakpoint(messages)
         else:
-            response = self.anthropic.messages.create(
-                model=MODEL,
-                max_tokens=1000,
-                messages=messages,
-            )
+            request["system"] = SYSTEM_PROMPT
+            request["messages"] = messages
+        if available_tools:
+            request["tools"] = available_tools
+        return request
+
+    async def create_message(self, **kwargs):
+        """Model call that never blocks the event loop, bounded by ANTHROPIC_CONCURRENCY"""
+        async with model_slot():
+            response = await self.anthropic.messages.create(**kwargs)
+        self.record_usage(getattr(response, "usage", None))
         return response
+
+    def record_usage(self, usage):
+        self.usage["requests"] += 1
+        if usage is None:
+            return
+        for field in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            self.usage[field] += getattr(usage, field, None) or 0
+        logger.debug(
+            "Model usage: %s input, %s output, %s cache write, %s cache read tokens",
+            usage.input_tokens, usage.output_tokens,
+            getattr(usage, "cache_creation_input_tokens", None), getattr(usage, "cache_read_input_tokens", None),
+        )
     
     async def sampling_callback(self, context, params):
-        print(context)
-        print(params)
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sampling request with %d message(s), max_tokens=%s", len(params.messages), params.maxTokens)
+
         lst_messages = []
         for message in params.messages:
             lst_messages.append({"role": message.role, "content": message.content.text})
         if lst_messages:
-            model_response = self.anthropic.messages.create(
+            model_response = await self.create_message(
                     model=MODEL,
                     max_tokens=4000,
                     messages=lst_messages,
@@ -188,6 +429,32 @@ class MCPClient:
             response = ClientResult(CreateMessageResult(content=TextContent(text="Something went wrong while processing the request", type="text"), model=MODEL, role="assistant"))
         return response
         
+    def tool_progress_callback(self, tool_name: str):
+        """Progress callback for one tool call, forwarding to the client's progress handler"""
+        async def on_progress(progress: float, total: Optional[float], message: Optional[str]):
+            await self.progress_handler(tool_name, progress, total, message)
+        return on_progress
+
+    @staticmethod
+    def tool_progress_emitter(content, emit: EventHandler):
+        """Progress callback for one tool call of a streamed query, emitting progress events"""
+        async def on_progress(progress: float, total: Optional[float], message: Optional[str]):
+            await emit({
+                "type": "progress", "id": content.id, "tool": content.name,
+                "progress": progress, "total": total, "message": message,
+            })
+        return on_progress
+
+    @staticmethod
+    async def log_tool_progress(tool_name: str, progress: float, total: Optional[float], message: Optional[str]):
+        total_text = f"/{total:g}" if total else ""
+        logger.info("[%s] %g%s %s", tool_name, progress, total_text, message or "")
+
+    @staticmethod
+    async def print_tool_progress(tool_name: str, progress: float, total: Optional[float], message: Optional[str]):
+        total_text = f"/{total:g}" if total else ""
+        print(f"[{tool_name}] {progress:g}{total_text} {message or ''}")
+
     async def chat_loop(self):
         """Run an interactive chat loop"""
         print("\nMCP Client Started!")
@@ -210,6 +477,21 @@ class MCPClient:
         """Clean up resources"""
         await self.exit_stack.aclose()
 
+    @classmethod
+    def json_payloads(cls, tool_results: List[Dict]):
+        """The answer of a step whose tools returned JSON for the caller (e.g. a redirect), None when
+        none did and the results go back to the model. A single payload is returned as is; with
+        several tool results, every one of them is returned, the text ones as text payloads."""
+        texts = []
+        for tool_result in tool_results:
+            content = tool_result["content"]
+            # Taking the first result content will only work if the tool returns a single result
+            texts.append(content if isinstance(content, str) else content[0]["text"] if content else "")
+        if not any(cls.is_string_json(text) for text in texts):
+            return None
+        payloads = [json.loads(text) if cls.is_string_json(text) else {"type": "text", "data": text} for text in texts]
+        return payloads[0] if len(payloads) == 1 else payloads
+
     @staticmethod
     def is_string_json(json_str: str) -> bool:
         return (json_str.startswith("{") and json_str.endswith("}")) or (json_str.startswith("[") and json_str.endswith("]"))
@@ -221,12 +503,15 @@ async def main():
     #     print("Usage: python client.py <path_to_server_script>")
     #     sys.exit(1)
 
-    client = MCPClient()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), stream=sys.stderr)
+    # Interactive use, show the tools' progress on the console
+    client = MCPClient(progress_handler=MCPClient.print_tool_progress)
     try:
         await client.connect_to_mcp_server_streamable_http_transport()
         await client.chat_loop()
     finally:
         await client.cleanup()
+        await close_anthropic_client()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Estimated prompt tokens of history sent to the model, older turns are dropped past it
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "50000"))
+# Share of the budget a trim brings the history down to, so the following turns reuse a stable
+# (prompt cached) prefix until the budget is reached again
+CONVERSATION_TRIM_TARGET = float(os.getenv("CONVERSATION_TRIM_TARGET", "0.7"))
+# Rough tokenizer: characters per token, plus a fixed overhead per message
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(content: Any) -> int:
+    """Cheap token estimate of a message content: a string or a list of content blocks."""
+    return _content_chars(content) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+def _content_chars(content: Any) -> int:
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, list):
+        return sum(_content_chars(block) for block in content)
+    if isinstance(content, dict):
+        if content.get("type") == "tool_use":
+            return len(content.get("name", "")) + len(json.dumps(content.get("input", {}), default=str))
+        if "text" in content:
+            return len(content["text"])
+        return _content_chars(content.get("content"))
+    text = getattr(content, "text", None)
+    return len(text) if isinstance(text, str) else len(str(content))
+
+def starts_turn(message: Dict[str, Any]) -> bool:
+    """A user message that is not only handing tool results back starts a new turn."""
+    if message.get("role") != "user":
+        return False
+    content = message.get("content")
+    if isinstance(content, list):
+        return not any(isinstance(block, dict) and block.get("type") == "tool_result" for block in content)
+    return True
+
+
+class Conversation:
+    """Chat history that is appended in place, with a running token estimate.
+
+    Once the history is over `token_budget`, `trim` drops whole turns, oldest first, until it fits
+    `trim_target` of the budget: a turn is a user message with everything answering it, so
+    tool_use / tool_result pairs are never split. The last turn is always kept.
+    """
+
+    def __init__(
+        self,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        token_budget: int = CONVERSATION_TOKEN_BUDGET,
+        trim_target: float = CONVERSATION_TRIM_TARGET,
+    ):
+        self.messages: List[Dict[str, Any]] = messages if messages is not None else []
+        self.token_budget = token_budget
+        self.trim_target = trim_target
+        self._tokens = [estimate_tokens(message.get("content")) for message in self.messages]
+        self.tokens = sum(self._tokens)
+        self.trimmed_turns = 0
+
+    def append(self, message: Dict[str, Any]):
+        tokens = estimate_tokens(message.get("content"))
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self.tokens += tokens
+
+    def extend(self, messages: List[Dict[str, Any]]):
+        for message in messages:
+            self.append(message)
+
+    def trim(self, token_budget: Optional[int] = None) -> int:
+        """When over budget, drop the oldest turns down to the trim target, returns the number of
+        messages dropped."""
+        budget = self.token_budget if token_budget is None else token_budget
+        if self.tokens <= budget:
+            return 0
+        target = budget * self.trim_target
+        turn_starts = [index for index, message in enumerate(self.messages) if starts_turn(message)]
+        # Messages before the first turn (e.g. an assistant preamble) go with the first cut
+        cut = 0
+        tokens = self.tokens
+        for start in turn_starts[1:] + [None]:
+            if tokens <= target or start is None:
+                break
+            tokens -= sum(self._tokens[cut:start])
+            cut = start
+            self.trimmed_turns += 1
+        if cut:
+            del self.messages[:cut]
+            del self._tokens[:cut]
+            self.tokens = tokens
+            logger.debug("Trimmed %d message(s) from the conversation, %d tokens left", cut, tokens)
+        return cut
+
+    def __len__(self):
+        return len(self.messages)
@@ -0,0 +1,345 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set
+from dotenv import load_dotenv
+
+from client import MCPClient
+from chat_store import CHAT_STORE_TTL, USAGE_FIELDS, ChatStore, StoredSession
+from conversation import CONVERSATION_TOKEN_BUDGET, Conversation
+from session_pool import PooledClient
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Seconds without a request before a chat session is closed
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+# Chat sessions kept open at once, the least recently used one is closed past it
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "500"))
+# Estimated tokens of history kept per session, older turns are dropped past it
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", str(CONVERSATION_TOKEN_BUDGET)))
+# Seconds between two looks for idle sessions
+CHAT_REAP_INTERVAL = float(os.getenv("CHAT_REAP_INTERVAL", "60"))
+
+
+def hash_login_cert(login_cert: Optional[str]) -> str:
+    """What the chat store keeps of a session's LoginCert, the cert itself is resent with every request"""
+    return hashlib.sha256((login_cert or "").encode()).hexdigest()
+
+
+class ChatSession:
+    def __init__(self, messages: List[Dict[str, str]], client: MCPClient, connection: Optional[PooledClient] = None):
+        self.conversation = Conversation(messages, token_budget=CHAT_HISTORY_TOKENS) # [{role: str, content: str | blocks}]
+        self.client = client
+        # Owns the client's MCP connection, when the session opened it
+        self.connection = connection
+        self.created = self.last_used = time.monotonic()
+        self.in_use = 0
+        # Version of the history in the chat store, and the usage already added to the store's
+        self.version = 0
+        self.saved_usage = dict(client.usage)
+        self.connect_lock = asyncio.Lock()
+
+    @property
+    def messages(self):
+        return self.conversation.messages
+
+    @contextmanager
+    def using(self):
+        """Marks the session busy for a request, busy sessions are never reaped or evicted"""
+        self.in_use += 1
+        try:
+            yield self
+        finally:
+            self.in_use -= 1
+            self.last_used = time.monotonic()
+            self.conversation.trim()
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+        else:
+            await self.client.cleanup()
+
+
+class SessionManager:
+    """The open chat sessions by id, least recently used first.
+
+    Looking a session up marks it used. Adding one past `max_sessions` closes the least recently
+    used idle session, and a background task closes the sessions unused for `ttl` seconds. Closing
+    happens in background tasks, requests never wait for it.
+
+    With a `store`, the open sessions are only a cache of MCP connections: the history lives in
+    the store, so any worker can serve any session. `get` reloads the history when another worker
+    changed it and reconnects to the MCP server when this worker has no live connection for it.
+    The store only keeps a hash of the session's LoginCert. A session open in this worker can be
+    used without its cert, any other worker needs the cert to reopen it: it is checked against the
+    hash and used for the connection. A cert that is sent is always checked.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CHAT_SESSION_TTL,
+        max_sessions: int = CHAT_MAX_SESSIONS,
+        reap_interval: float = CHAT_REAP_INTERVAL,
+        store: Optional[ChatStore] = None,
+        store_ttl: float = CHAT_STORE_TTL,
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.reap_interval = reap_interval
+        self.store = store
+        self.store_ttl = store_ttl
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._closing: Set[asyncio.Task] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self.evicted = 0
+        self.expired = 0
+
+    async def start(self):
+        self._reaper = asyncio.create_task(self._reap())
+
+    async def close(self):
+        """Close every session, on shutdown"""
+        if self._reaper:
+            self._reaper.cancel()
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions), *self._closing, return_exceptions=True)
+        if self.store:
+            await self.store.close()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __getitem__(self, session_id: str) -> ChatSession:
+        session = self._sessions[session_id]
+        self._touch(session_id, session)
+        return session
+
+    def _touch(self, session_id: str, session: ChatSession):
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+
+    def __setitem__(self, session_id: str, session: ChatSession):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > self.max_sessions:
+            self._evict()
+
+    def __delitem__(self, session_id: str):
+        self._close_later(self._sessions.pop(session_id))
+
+    async def create(self, session_id: str, client: MCPClient, metadata: Optional[Dict[str, Any]] = None) -> ChatSession:
+        """Connect `client` to the MCP server and open a session with it"""
+        metadata = {**(metadata or {}), "loginCertHash": hash_login_cert(client.PF_loginCert)}
+        # Its own task owns the connection, so the session can be closed from any request or the reaper
+        connection = PooledClient(client)
+        await connection.open()
+        try:
+            if self.store:
+                await self.store.create(session_id, metadata)
+        except BaseException:
+            await connection.close()
+            raise
+        session = ChatSession(messages=[], client=client, connection=connection)
+        self[session_id] = session
+        return session
+
+    def check_login_cert(self, session_id: str, login_cert: Optional[str], login_cert_hash: Optional[str]):
+        """Raises PermissionError when `login_cert` is not the session's, or is missing while the
+        session is not open in this worker"""
+        if login_cert is None:
+            if session_id in self._sessions:
+                return
+            raise PermissionError("The loginCert the chat session was started with is needed to reopen it")
+        if login_cert_hash != hash_login_cert(login_cert):
+            raise PermissionError("The loginCert does not match the chat session's")
+
+    async def get(self, session_id: str, login_cert: Optional[str] = None) -> Optional[ChatSession]:
+        """The session with its current history and a live MCP connection, None when it does not exist.
+        Raises PermissionError when `login_cert` does not allow it (see `check_login_cert`)."""
+        if self.store is None:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self.check_login_cert(session_id, login_cert, hash_login_cert(session.client.PF_loginCert))
+            return self[session_id]
+
+        cached = self._sessions.get(session_id)
+        stored = await self.store.load(session_id, cached.version if cached else None)
+        if stored is None:
+            # Ended by another worker
+            if session_id in self._sessions:
+                del self[session_id]
+            return None
+        # Another request of this worker may have opened it meanwhile
+        session = self._sessions.get(session_id)
+        if session is None and stored.messages is None:
+            # Closed meanwhile, the history is needed after all
+            stored = await self.store.load(session_id)
+            if stored is None:
+                return None
+            session = self._sessions.get(session_id)
+        self.check_login_cert(session_id, login_cert, stored.metadata.get("loginCertHash"))
+        if session is None:
+            client = MCPClient(PF_loginCert=login_cert)
+            session = ChatSession(messages=stored.messages, client=client, connection=PooledClient(client))
+            session.version = stored.version
+            self[session_id] = session
+        elif stored.messages is not None and stored.version != session.version:
+            session.conversation = Conversation(stored.messages, token_budget=CHAT_HISTORY_TOKENS)
+            session.version = stored.version
+        await self._connect(session)
+        if self._sessions.get(session_id) is session:
+            self._touch(session_id, session)
+        return session
+
+    async def _connect(self, session: ChatSession):
+        """Reconnect a session whose MCP connection is not open in this worker"""
+        async with session.connect_lock:
+            if session.connection is None or session.connection.alive:
+                return
+            connection = PooledClient(session.client)
+            await connection.open()
+            session.connection = connection
+
+    async def save(self, session_id: str, session: ChatSession):
+        """Write the session's history and the model usage of the request to the store"""
+        if self.store is None:
+            return
+        usage = session.client.usage
+        delta = {name: usage.get(name, 0) - session.saved_usage.get(name, 0) for name in USAGE_FIELDS}
+        session.saved_usage = dict(usage)
+        version = await self.store.save(session_id, session.messages, delta)
+        if version is None:
+            logger.info("[Chat] Session ended while answering, session_id=%s", session_id)
+            if session_id in self._sessions:
+                del self[session_id]
+        else:
+            session.version = version
+
+    async def load(self, session_id: str, login_cert: Optional[str] = None) -> Optional[StoredSession]:
+        """The stored history and usage of a session, without connecting it. Raises PermissionError
+        when `login_cert` does not allow it (see `check_login_cert`)."""
+        if self.store is not None:
+            stored = await self.store.load(session_id)
+            if stored is not None:
+                self.check_login_cert(session_id, login_cert, stored.metadata.get("loginCertHash"))
+            return stored
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        self.check_login_cert(session_id, login_cert, hash_login_cert(session.client.PF_loginCert))
+        return StoredSession(session_id, {}, session.messages, session.client.usage, session.version)
+
+    async def end(self, session_id: str, login_cert: Optional[str] = None) -> bool:
+        """Delete a session and wait until it is closed, False when it did not exist. Raises
+        PermissionError when `login_cert` does not allow it (see `check_login_cert`)."""
+        cached = self._sessions.get(session_id)
+        if self.store is not None:
+            stored = await self.store.load(session_id, cached.version if cached else None)
+            if stored is None:
+                return False
+            self.check_login_cert(session_id, login_cert, stored.metadata.get("loginCertHash"))
+        elif cached is not None:
+            self.check_login_cert(session_id, login_cert, hash_login_cert(cached.client.PF_loginCert))
+        deleted = await self.store.delete(session_id) if self.store else False
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            await session.close()
+        return deleted or session is not None
+
+    def _evict(self):
+        for session_id, session in self._sessions.items():
+            if not session.in_use:
+                logger.info("[Chat] Session limit of %d reached, closing least recently used session_id=%s", self.max_sessions, session_id)
+                del self[session_id]
+                self.evicted += 1
+                return
+        logger.warning("[Chat] %d sessions open, all of them busy", len(self._sessions))
+
+    def _close_later(self, session: ChatSession):
+        task = asyncio.create_task(self._close(session))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(session: ChatSession):
+        try:
+            await session.close()
+        except Exception:
+            logger.warning("Error while closing a chat session", exc_info=True)
+
+    def expire(self) -> int:
+        """Close the sessions unused for `ttl` seconds, returns how many"""
+        deadline = time.monotonic() - self.ttl
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_used < deadline and not session.in_use
+        ]
+        for session_id in expired:
+            logger.info("[Chat] Session idle for %ss, closing session_id=%s", self.ttl, session_id)
+            del self[session_id]
+        self.expired += len(expired)
+        return len(expired)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                self.expire()
+                if self.store:
+                    purged = await self.store.purge(self.store_ttl)
+                    if purged:
+                        logger.info("[Chat] Deleted %d stored session(s) idle for %ss", purged, self.store_ttl)
+            except Exception:
+                logger.exception("Chat session reaper failed")
+
+    def stats(self) -> dict:
+        """Open sessions and their history, with its approximate size in memory"""
+        now = time.monotonic()
+        sessions = list(self._sessions.values())
+        history_bytes = [deep_sizeof(session.messages) for session in sessions]
+        return {
+            "store": type(self.store).__name__ if self.store else None,
+            "sessions": len(sessions),
+            "busy": sum(1 for session in sessions if session.in_use),
+            "max_sessions": self.max_sessions,
+            "ttl_s": self.ttl,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "closing": len(self._closing),
+            "history_messages": sum(len(session.messages) for session in sessions),
+            "history_tokens": sum(session.conversation.tokens for session in sessions),
+            "history_bytes": sum(history_bytes),
+            "largest_history_bytes": max(history_bytes, default=0),
+            "oldest_idle_s": round(max((now - session.last_used for session in sessions), default=0), 1),
+        }
+
+
+def deep_sizeof(value: Any) -> int:
+    """Bytes held by a history: the messages, their blocks and strings (shared objects counted once)"""
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
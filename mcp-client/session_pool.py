@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import logging
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+from client import MCP_SERVER_URL, MCPClient
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Most MCP sessions open at once (leased + idle), more requests wait for one to be released
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "8"))
+# Sessions opened at startup and kept open when idle
+MCP_POOL_WARM = int(os.getenv("MCP_POOL_WARM", "2"))
+# Seconds before an idle session above the warm ones is closed
+MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+# Idle sessions are pinged this often (seconds), and before a lease when idle for longer
+MCP_POOL_PING_INTERVAL = float(os.getenv("MCP_POOL_PING_INTERVAL", "30"))
+MCP_POOL_PING_TIMEOUT = float(os.getenv("MCP_POOL_PING_TIMEOUT", "5"))
+
+
+class PooledClient:
+    """An MCPClient connected to the server for as long as it is open.
+
+    The MCP transport must be entered and exited by the same task, so a keeper task owns the
+    connection: it connects, waits for `close`, then cleans up. Any task can use the client.
+    """
+
+    def __init__(self, client: Optional[MCPClient] = None):
+        self.client = client or MCPClient()
+        self.last_used = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._keeper: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def open(self):
+        self._keeper = asyncio.create_task(self._keep())
+        ready = asyncio.create_task(self._ready.wait())
+        # The transport cancels the keeper when the server cannot be reached
+        await asyncio.wait({ready, self._keeper}, return_when=asyncio.FIRST_COMPLETED)
+        ready.cancel()
+        if self._error or self._keeper.done():
+            await self.close()
+            reason = repr(self._error) if self._error else "the transport closed"
+            raise ConnectionError(f"Could not open an MCP session to {MCP_SERVER_URL}: {reason}")
+
+    async def _keep(self):
+        try:
+            try:
+                await self.client.connect_to_mcp_server_streamable_http_transport()
+            except Exception as e:
+                self._error = e
+                return
+            finally:
+                self._ready.set()
+            await self._closing.wait()
+        finally:
+            try:
+                await self.client.cleanup()
+            except Exception:
+                logger.debug("Error while closing an MCP session", exc_info=True)
+
+    @property
+    def alive(self) -> bool:
+        # The keeper ends early when the transport fails
+        return self._keeper is not None and not self._keeper.done()
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.client.session.send_ping(), MCP_POOL_PING_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.info("MCP session failed its health check: %r", e)
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._keeper is None:
+            return
+        await asyncio.wait({self._keeper}, timeout=MCP_POOL_PING_TIMEOUT)
+        if not self._keeper.done():
+            self._keeper.cancel()
+        elif not self._keeper.cancelled() and self._keeper.exception():
+            logger.debug("MCP session did not close cleanly: %r", self._keeper.exception())
+
+
+class MCPClientPool:
+    """Warm, initialized MCP sessions leased to one request at a time.
+
+    A lease applies the request's PF_loginCert to the client and clears it on release. Idle
+    sessions are health checked with a ping and the ones that fail, or fail a request, are
+    closed and replaced.
+    """
+
+    def __init__(
+        self,
+        size: int = MCP_POOL_SIZE,
+        warm: int = MCP_POOL_WARM,
+        idle_timeout: float = MCP_POOL_IDLE_TIMEOUT,
+        ping_interval: float = MCP_POOL_PING_INTERVAL,
+    ):
+        self.size = size
+        self.warm = min(warm, size)
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle: List[PooledClient] = []
+        self._slots = asyncio.Semaphore(size)
+        self._leased = 0
+        self._closed = False
+        self._maintainer: Optional[asyncio.Task] = None
+        self.created = 0
+        self.replaced = 0
+
+    async def start(self):
+        """Open the warm sessions, the API still starts when the server cannot be reached."""
+        await self._top_up()
+        self._maintainer = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        self._closed = True
+        if self._maintainer:
+            self._maintainer.cancel()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(pooled.close() for pooled in idle))
+
+    @asynccontextmanager
+    async def lease(self, PF_loginCert: Optional[str] = None):
+        async with self._slots:
+            pooled = await self._acquire()
+            self._leased += 1
+            pooled.client.PF_loginCert = PF_loginCert
+            failed = False
+            try:
+                yield pooled.client
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self._leased -= 1
+                await self._release(pooled, failed)
+
+    async def _acquire(self) -> PooledClient:
+        while self._idle:
+            # Most recently used first, the older ones age out
+            pooled = self._idle.pop()
+            if pooled.alive and (time.monotonic() - pooled.last_used < self.ping_interval or await pooled.ping()):
+                return pooled
+            await self._replace(pooled)
+        return await self._open()
+
+    async def _release(self, pooled: PooledClient, failed: bool):
+        pooled.client.PF_loginCert = None
+        pooled.last_used = time.monotonic()
+        if self._closed or not pooled.alive or (failed and not await pooled.ping()):
+            await self._replace(pooled)
+        else:
+            self._idle.append(pooled)
+
+    async def _open(self) -> PooledClient:
+        pooled = PooledClient()
+        await pooled.open()
+        self.created += 1
+        return pooled
+
+    async def _replace(self, pooled: PooledClient):
+        """Close a broken session, the next lease or health check opens a new one"""
+        self.replaced += 1
+        await pooled.close()
+
+    async def _top_up(self):
+        missing = self.warm - len(self._idle) - self._leased
+        if missing <= 0 or self._closed:
+            return
+        opened = await asyncio.gather(*(self._open() for _ in range(missing)), return_exceptions=True)
+        for pooled in opened:
+            if isinstance(pooled, BaseException):
+                logger.warning("Could not open a pooled MCP session: %r", pooled)
+            else:
+                self._idle.append(pooled)
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                await self._check_idle()
+                await self._top_up()
+            except Exception:
+                logger.exception("MCP session pool maintenance failed")
+
+    async def _check_idle(self):
+        """Close the sessions idle past idle_timeout above the warm ones, and those failing a ping"""
+        now = time.monotonic()
+        # Taken out of the pool while checked, so they are not leased meanwhile
+        checked, self._idle = self._idle, []
+        keep = []
+        for pooled in reversed(checked):
+            if len(keep) >= self.warm and now - pooled.last_used > self.idle_timeout:
+                await pooled.close()
+            elif pooled.alive and await pooled.ping():
+                keep.append(pooled)
+            else:
+                await self._replace(pooled)
+        self._idle[:0] = reversed(keep)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "warm": self.warm,
+            "idle": len(self._idle),
+            "leased": self._leased,
+            "created": self.created,
+            "replaced": self.replaced,
+        }
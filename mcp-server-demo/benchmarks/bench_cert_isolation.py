@@ -0,0 +1,103 @@
+"""Concurrent tool calls carrying different PF_loginCert over one in-memory MCP session, against
+a stub Planview that records the Cookie header of every upstream request and answers with the
+cert it saw. Checks that each upstream call went out with the cert of the tool call that made
+it, and that cached strategy reads never serve another tenant's answer. Exits 1 on any bleed.
+
+    python benchmarks/bench_cert_isolation.py --calls 50
+"""
+import sys
+import json
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from mcp.shared.memory import create_connected_server_and_client_session
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils import http_client
+from utils.shared_mcp import mcp, Session
+import tools.strategy_tool  # noqa: F401
+import tools.smart_timeentry  # noqa: F401
+
+# Strategy ids shared by several tenants, so cached reads are keyed per tenant or bleed
+STRATEGY_IDS = 5
+
+
+def cert_of(request: httpx.Request) -> str:
+    cookies = dict(part.split("=", 1) for part in request.headers.get("cookie", "").split("; ") if "=" in part)
+    return cookies.get("LoginCert", "")
+
+def stub_planview(seen: list):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        cert = cert_of(request)
+        seen.append((request.method, request.url.path, cert))
+        # Interleave the calls of the different tenants
+        await asyncio.sleep(random.uniform(0, 0.01))
+        if "/strategies/byId/" in request.url.path:
+            return httpx.Response(200, json={"StructureCode": request.url.path.rsplit("/", 1)[-1], "Description": cert})
+        return httpx.Response(200, json={"Status": "done"})
+    return handler
+
+async def call(session, n: int) -> list:
+    problems = []
+    cert = f"cert-{n}"
+    strategy, timeentry = await asyncio.gather(
+        session.call_tool("get_strategy_detail", {"id": str(n % STRATEGY_IDS), "PF_loginCert": cert}),
+        session.call_tool("smart_timeentry", {"date": "2025-04-12", "PF_loginCert": cert}),
+    )
+    text = strategy.content[0].text if strategy.content else ""
+    if f"Strategy '{cert}'" not in text:
+        problems.append(f"{cert} got the strategy answer {text[:120]!r}")
+    if timeentry.isError:
+        problems.append(f"{cert} smart_timeentry failed: {timeentry.content}")
+    return problems
+
+async def run(calls: int, rounds: int) -> dict:
+    seen = []
+    client = await http_client.start_http_client()
+    client._transport = httpx.MockTransport(stub_planview(seen))
+    # A process wide cert that must never be used while a call carries its own
+    Session.login_cert = "process-default"
+    problems = []
+    async with create_connected_server_and_client_session(mcp._mcp_server) as session:
+        for _ in range(rounds):
+            outcomes = await asyncio.gather(*(call(session, n) for n in range(calls)))
+            problems.extend(problem for outcome in outcomes for problem in outcome)
+    await http_client.close_http_client()
+
+    certs = {f"cert-{n}" for n in range(calls)}
+    strategy_certs = Counter(cert for method, path, cert in seen if "/strategies/byId/" in path)
+    timeentry_certs = Counter(cert for method, path, cert in seen if path.endswith("/smart-timeentry"))
+    for method, path, cert in seen:
+        if cert not in certs:
+            problems.append(f"{method} {path} went out with LoginCert {cert!r}")
+    # Later rounds read the strategies from the cache, each tenant's first read still goes upstream
+    if set(strategy_certs) != certs or any(count != 1 for count in strategy_certs.values()):
+        problems.append(f"strategy reads per cert {dict(strategy_certs)}")
+    if set(timeentry_certs) != certs or any(count != rounds for count in timeentry_certs.values()):
+        problems.append(f"time entries per cert {dict(timeentry_certs)}")
+    return {
+        "calls": calls * rounds * 2,
+        "upstream_requests": len(seen),
+        "tenants": len(certs),
+        "problems": problems,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="No LoginCert bleed between concurrent tool calls")
+    parser.add_argument("--calls", type=int, default=50, help="Concurrent tenants, each calling two tools")
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(run(args.calls, args.rounds))
+    print(json.dumps(result, indent=2))
+    return 1 if result["problems"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
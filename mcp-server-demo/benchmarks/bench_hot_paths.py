@@ -0,0 +1,117 @@
+"""Micro-benchmarks of the server hot paths, offline, with JSON baselines.
+
+- make_allocation_paylod / render_allocation_payload
+- make_api_request against an in-process stub transport (write, and cached read)
+- Project.create_work_and_wbs_in_pf over synthetic WBS trees of 10, 100 and 1000 items, and of 100
+  items with the templates served from the cache (TEMPLATE_SERVER_FIELDS_FROM_CREATE)
+
+    python benchmarks/bench_hot_paths.py              # print the results
+    python benchmarks/bench_hot_paths.py --save       # record them as benchmarks/baselines/hot_paths.json
+    python benchmarks/bench_hot_paths.py --compare    # exit 1 on a regression against the baseline
+"""
+import sys
+import json
+import logging
+import itertools
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# The harness is shared by the server and client benchmarks, in benchmarks/ at the repository root
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from benchmarks.harness import measure, report
+from utils import http_client
+from utils.shared_mcp import work_cache
+from utils.template_cache import template_cache
+from utils.response_cache import response_cache, cacheable_endpoint
+from features.allocation import make_allocation_paylod, render_allocation_payload
+from features.project import Project
+
+BASELINE = Path(__file__).parent / "baselines" / "hot_paths.json"
+WBS_SIZES = (10, 100, 1000)
+
+_structure_codes = itertools.count(1000)
+
+def stub_planview(request: httpx.Request) -> httpx.Response:
+    """Answers like the Planview endpoints the features call, without any latency. A create keeps the
+    StructureCode handed out by `/new`, or gets one minted when it carries none (a cached template)."""
+    path = request.url.path
+    if path.endswith("/new"):
+        return httpx.Response(200, json={"StructureCode": str(next(_structure_codes)), "Description": "", "Attributes": {}})
+    if request.method == "POST" and path.endswith(("/projects", "/works")):
+        body = json.loads(request.content)
+        return httpx.Response(200, json={**body, "StructureCode": body.get("StructureCode") or str(next(_structure_codes))})
+    return httpx.Response(200, json={"StructureCode": "1", "Description": "Strategy", "Status": {"Description": "Active"}})
+
+def synthetic_wbs(size: int) -> dict:
+    """A project, epics of up to 9 stories each, `size` items in total."""
+    items = [{"id": "project-1", "type": "project", "name": "Benchmark work", "description": "", "parent_id": None}]
+    epic = None
+    for n in range(1, size):
+        if epic is None or n % 10 == 1:
+            epic = f"epic-{n}"
+            items.append({"id": epic, "type": "epic", "name": f"Epic {n}", "description": "", "parent_id": "project-1"})
+        else:
+            items.append({"id": f"story-{n}", "type": "story", "name": f"Story {n}", "description": "", "parent_id": epic})
+    return {"items": items}
+
+def reset_caches():
+    response_cache.invalidate()
+    template_cache.invalidate()
+    work_cache.clear()
+
+async def use_stub_client():
+    client = await http_client.start_http_client()
+    client._transport = httpx.MockTransport(stub_planview)
+
+def main():
+    # Keep log I/O out of the measurement
+    logging.disable(logging.CRITICAL)
+    cacheable_endpoint("/internal-api/strategies/byId/")
+    results = {
+        "make_allocation_paylod_serialized": measure(lambda: json.dumps(make_allocation_paylod("20276", "20277", "20556")), iterations=20_000),
+        "render_allocation_payload": measure(lambda: render_allocation_payload("20276", "20277", "20556"), iterations=20_000),
+    }
+
+    async def api_write():
+        await use_stub_client()
+        await http_client.make_api_request("/internal-api/works", http_client.HTTPMethod.POST, body={"Description": "x"})
+
+    async def api_cached_read():
+        await use_stub_client()
+        await http_client.make_api_request("/internal-api/strategies/byId/1", http_client.HTTPMethod.POST)
+
+    results["make_api_request_write"] = measure(api_write, iterations=1_000, is_async=True)
+    results["make_api_request_cached_read"] = measure(api_cached_read, iterations=5_000, is_async=True)
+
+    for size in WBS_SIZES:
+        wbs = synthetic_wbs(size)
+
+        async def create_wbs():
+            await use_stub_client()
+            await Project().create_work_and_wbs_in_pf(wbs, "Benchmark work")
+
+        # Every round starts cold: no cached template, no cached work
+        results[f"create_work_and_wbs_{size}"] = measure(
+            create_wbs, iterations=max(1, 200 // size), repeat=5, is_async=True, setup=reset_caches,
+        )
+
+    wbs = synthetic_wbs(100)
+
+    async def create_wbs_cached_templates():
+        await use_stub_client()
+        await Project().create_work_and_wbs_in_pf(wbs, "Benchmark work")
+
+    template_cache.server_fields_from_create = True
+    try:
+        results["create_work_and_wbs_100_cached_templates"] = measure(
+            create_wbs_cached_templates, iterations=2, repeat=5, is_async=True, setup=reset_caches,
+        )
+    finally:
+        template_cache.server_fields_from_create = False
+    return report(results, BASELINE)
+
+if __name__ == "__main__":
+    sys.exit(main())
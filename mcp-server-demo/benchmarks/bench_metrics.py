@@ -0,0 +1,69 @@
+"""Overhead of the /metrics instrumentation on the upstream hot path.
+
+Times the exact metric updates done around one upstream call (in-flight gauge, request
+counter, latency histogram) and one tool call, and compares them with a full
+make_api_request against an in-process stub transport.
+
+    python benchmarks/bench_metrics.py
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils import http_client
+from utils.metrics import Counter, Gauge, Histogram
+
+ITERATIONS = 100_000
+REQUESTS = 2_000
+
+
+def time_per_op(fn, iterations=ITERATIONS) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+def bench_instrumentation() -> dict:
+    requests = Counter("bench_requests_total", "", ["endpoint", "method", "status"])
+    latency = Histogram("bench_latency_seconds", "", ["endpoint", "method"])
+    in_flight = Gauge("bench_in_flight", "")
+
+    def upstream_call_metrics():
+        in_flight.inc()
+        in_flight.dec()
+        requests.inc("/internal-api/works", "POST", "200")
+        latency.observe(0.042, "/internal-api/works", "POST")
+
+    return {
+        "upstream_call_metrics_us": time_per_op(upstream_call_metrics) * 1e6,
+        "histogram_observe_us": time_per_op(lambda: latency.observe(0.042, "/internal-api/works", "POST")) * 1e6,
+        "counter_inc_us": time_per_op(lambda: requests.inc("/internal-api/works", "POST", "200")) * 1e6,
+    }
+
+async def bench_make_api_request() -> float:
+    client = await http_client.start_http_client()
+    client._transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"StructureCode": "1"}))
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await http_client.make_api_request("/internal-api/works", http_client.HTTPMethod.POST, body={"Description": "x"})
+    elapsed = (time.perf_counter() - started) / REQUESTS
+    await http_client.close_http_client()
+    return elapsed * 1e6
+
+def main():
+    # Keep log I/O out of the measurement
+    logging.disable(logging.CRITICAL)
+    results = bench_instrumentation()
+    results["make_api_request_us"] = asyncio.run(bench_make_api_request())
+    results["overhead_percent"] = 100 * results["upstream_call_metrics_us"] / results["make_api_request_us"]
+    print(json.dumps({key: round(value, 3) for key, value in results.items()}, indent=2))
+
+if __name__ == "__main__":
+    main()
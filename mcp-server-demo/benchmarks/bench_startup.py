@@ -0,0 +1,72 @@
+"""Startup cost of the MCP server, which stdio clients pay on every spawn.
+
+Measures, with the tool manifest (lazy tool imports) and without it (every tool module
+imported at boot):
+- import_s: time to import main.py and the tool modules it loads,
+- first_list_tools_s: from spawning `main.py --mode stdio` to the first list_tools answer.
+
+    python main.py --build_manifest
+    python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+import subprocess
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PATH = Path(__file__).resolve().parents[1]
+RUNS = 5
+
+IMPORT_SNIPPET = """
+import sys, time
+started = time.perf_counter()
+import main
+from utils.tool_manifest import LAZY_TOOLS, LazyTools, load_manifest
+manifest = load_manifest() if LAZY_TOOLS else None
+if manifest is not None:
+    LazyTools(main.mcp, manifest, main.discover_tool_modules()).load_eager_modules()
+else:
+    for module_name in main.discover_tool_modules():
+        main.load_tool_module(module_name)
+print(time.perf_counter() - started)
+"""
+
+def server_env(lazy: bool) -> dict:
+    return {**os.environ, "LAZY_TOOLS": "true" if lazy else "false", "LOG_LEVEL": "WARNING"}
+
+def import_time(lazy: bool) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=PATH, env=server_env(lazy),
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+async def first_list_tools_time(lazy: bool) -> float:
+    params = StdioServerParameters(command=sys.executable, args=[str(PATH / "main.py"), "--mode", "stdio"], env=server_env(lazy), cwd=str(PATH))
+    started = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await session.list_tools()
+                return time.perf_counter() - started
+
+def main():
+    if not (PATH / "tool_manifest.json").exists() and not os.getenv("TOOL_MANIFEST"):
+        sys.exit("No tool manifest, run `python main.py --build_manifest` first")
+    results = {}
+    for label, lazy in (("manifest", True), ("eager", False)):
+        results[label] = {
+            "import_s": statistics.median(import_time(lazy) for _ in range(RUNS)),
+            "first_list_tools_s": statistics.median(asyncio.run(first_list_tools_time(lazy)) for _ in range(RUNS)),
+        }
+    print(json.dumps({label: {key: round(value, 3) for key, value in values.items()} for label, values in results.items()}, indent=2))
+
+if __name__ == "__main__":
+    main()
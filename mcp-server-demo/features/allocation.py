@@ -1,13 +1,29 @@
 import os
+import re
 import json
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 from utils.http_client import make_api_request, HTTPMethod
+from utils.helpers import gather_bounded
+from utils.response_cache import invalidate_cached_responses
 
 load_dotenv()
 BASE_API_URL = os.getenv("BASE_API_URL")
+ALLOCATION_URL = "/services/AllocateListAttributeServiceJson.svc/InsertRow?pt=PROJECT"
+# Max number of InsertRow calls in flight for a bulk allocation
+ALLOCATION_CONCURRENCY = int(os.getenv("ALLOCATION_CONCURRENCY", "8"))
+# Planview code of the demo resource ("Demo Ai")
+ALLOCATION_RESOURCE_CODE = os.getenv("ALLOCATION_RESOURCE_CODE", "20556")
+# Planview resource codes by resource name, as JSON, e.g. {"Jane Doe": "20601"}: there is no lookup by name in Planview yet
+ALLOCATION_RESOURCES = {"Demo Ai": ALLOCATION_RESOURCE_CODE, **json.loads(os.getenv("ALLOCATION_RESOURCES", "{}"))}
 
-def make_allocation_paylod(project_code, task_code, resource_code):
+def resource_code_of(resource_name: str) -> Optional[str]:
+    """Planview code of a resource from ALLOCATION_RESOURCES (case insensitive), None when it is unknown."""
+    codes = {name.casefold(): code for name, code in ALLOCATION_RESOURCES.items()}
+    return codes.get(resource_name.strip().casefold())
+
+def make_allocation_paylod(project_code, task_code, resource_code, resource_name="Demo Ai"):
 
     return {
             "pplCode": project_code,
@@ -62,8 +78,8 @@ def make_allocation_paylod(project_code, task_code, resource_code):
                         "LinkPath": ""
                     }, {
                         "ColumnId": "ALLO_RESOURCE_DESCRIPTION",
-                        "CurrentValue": f"{resource_code}|Demo Ai",
-                        "OriginalValue": f"{resource_code}|Demo Ai",
+                        "CurrentValue": f"{resource_code}|{resource_name}",
+                        "OriginalValue": f"{resource_code}|{resource_name}",
                         "Type": 7,
                         "DisplayText": None,
                         "IsReadOnly": False,
@@ -171,13 +187,54 @@ def make_allocation_paylod(project_code, task_code, resource_code):
             }
         }
 
+def _compile_allocation_template() -> List[str]:
+    """Serialize the allocation payload once, split around the cells that change per allocation.
+
+    Even items are literal JSON, odd items are the name of the value to insert.
+    """
+    placeholders = {name: f"@@{name}@@" for name in ("project_code", "task_code", "resource_code", "resource_name")}
+    return re.split(r"@@(\w+)@@", json.dumps(make_allocation_paylod(**placeholders)))
+
+_ALLOCATION_TEMPLATE = _compile_allocation_template()
+
+def render_allocation_payload(project_code, task_code, resource_code, resource_name="Demo Ai") -> str:
+    """JSON body of an InsertRow call, built from the pre-serialized template."""
+    # Every placeholder sits inside a JSON string, so values are inserted escaped and without quotes
+    values = {
+        "project_code": json.dumps(str(project_code))[1:-1],
+        "task_code": json.dumps(str(task_code))[1:-1],
+        "resource_code": json.dumps(str(resource_code))[1:-1],
+        "resource_name": json.dumps(str(resource_name))[1:-1],
+    }
+    parts = _ALLOCATION_TEMPLATE[:]
+    for index in range(1, len(parts), 2):
+        parts[index] = values[parts[index]]
+    return "".join(parts)
+
 class Allocation:
-    async def create(self, project_code, task_code, resource_code):
-        URL = f"/services/AllocateListAttributeServiceJson.svc/InsertRow?pt=PROJECT"
-        payload = make_allocation_paylod(project_code, task_code, resource_code)
+    async def create(self, project_code, task_code, resource_code, resource_name="Demo Ai"):
+        payload = render_allocation_payload(project_code, task_code, resource_code, resource_name)
 
-        json_resp = await make_api_request(URL, HTTPMethod.POST, body=payload)
+        json_resp = await make_api_request(ALLOCATION_URL, HTTPMethod.POST, content=payload)
+        invalidate_cached_responses("/services/AllocateListAttributeServiceJson.svc")
+        if json_resp is None:
+            return f"Something went wrong when creating the allocation - no response from {ALLOCATION_URL}"
         errors = json_resp.get('d', {}).get('Errors', [])
         if len(errors)!=0:
             return f"Something went wrong when creating the allocation - {errors}"
-        return "Allocation created"
\ No newline at end of file
+        return "Allocation created"
+
+    async def create_many(self, allocations: List[Dict[str, Any]], concurrency: int = ALLOCATION_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Create several allocations concurrently.
+
+        Each allocation is a dict with `project_code`, `task_code`, `resource_code` and `resource_name`; the result keeps
+        the input order and adds a `status` ("created" or "failed") and a `detail` message to each row.
+        """
+        async def create_row(allocation):
+            detail = await self.create(
+                allocation["project_code"], allocation["task_code"], allocation["resource_code"], allocation["resource_name"],
+            )
+            status = "created" if detail == "Allocation created" else "failed"
+            return {**allocation, "status": status, "detail": detail}
+
+        return await gather_bounded((create_row(allocation) for allocation in allocations), concurrency)
\ No newline at end of file
@@ -1,26 +1,34 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Awaitable, Optional
 from dotenv import load_dotenv
 
 from features.task import Task
 from utils.shared_mcp import work_cache
-from utils.http_client import make_api_request, HTTPMethod
-from utils.helpers import find_details_in_dct
+from utils.http_client import make_api_request, HTTPMethod, tenant_key
+from utils.template_cache import fetch_structure_template, created_structure_code
+from utils.response_cache import invalidate_cached_responses
+from utils.helpers import order_work_items_by_level, gather_bounded
 from utils.constants import PLAN_PAGE_URL, GET_STRUCTURE_PARTIAL_URL, CREATE_PARTIAL_URL
 
 load_dotenv() 
 BASE_API_URL = os.getenv("BASE_API_URL")
+# Max number of sibling works created in Planview at the same time
+WBS_CONCURRENCY = int(os.getenv("WBS_CONCURRENCY", "8"))
+
+# Called after each created WBS item with (done, total, item, structure_code)
+ProgressCallback = Callable[[int, int, Dict[str, Any], str], Awaitable[None]]
 
 class Project:
     def __init__(self):
         self.task = Task()
 
     async def get_structure_code(self):
-        return await make_api_request(GET_STRUCTURE_PARTIAL_URL, method=HTTPMethod.GET)        
+        return await fetch_structure_template(GET_STRUCTURE_PARTIAL_URL)
         
     async def create(self, work_name: str, work_description: str, father_code: str = "9"):
         json_response = await self.get_structure_code()
-        structure_code = json_response.get("StructureCode")
+        if not json_response:
+            raise RuntimeError(f"Planview returned no structure template for the project '{work_name}'")
         
         payload = json_response
         payload["Description"] = work_name
@@ -32,46 +40,64 @@ class Project:
         }
 
         response = await make_api_request(CREATE_PARTIAL_URL, HTTPMethod.POST, body=payload)
-
-        return structure_code
+        # The new project shows up under its parent strategy
+        invalidate_cached_responses(CREATE_PARTIAL_URL, "/internal-api/strategies")
+        # Templates served from the cache have no StructureCode, the created project carries it
+        return created_structure_code(payload, response)
     
-    async def create_work_and_wbs_in_pf(self, dct_work_structure: Dict[str, Any], work_name: str) -> Dict[str, str]:
-        """Create a work from a project structure. This needs to be triggered if there is a work structure in the request"""
+    async def create_work_and_wbs_in_pf(
+        self,
+        dct_work_structure: Dict[str, Any],
+        work_name: str,
+        concurrency: int = WBS_CONCURRENCY,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, str]:
+        """Create a work from a project structure. This needs to be triggered if there is a work structure in the request
+
+        Items are created level by level: every item of a level only depends on the level above,
+        so siblings are created concurrently (at most `concurrency` at a time).
+        `on_progress` is awaited as soon as each item exists in Planview.
+        """
         processed_work = {}
-        work_structure = dct_work_structure.get("items")
-        work_cache[work_name] = {}
-        
+        levels = order_work_items_by_level(dct_work_structure.get("items") or [])
+        tenant = tenant_key()
+        structure_codes_by_name = {}
+        total = sum(len(level) for level in levels)
+        done = 0
+
+        async def create_and_report(item):
+            nonlocal done
+            structure_code = await self.create_work_item(item, processed_work)
+            done += 1
+            if on_progress:
+                await on_progress(done, total, item, structure_code)
+            return structure_code
+
         project_id = None
-        for item in work_structure:
-            name = item.get("name")
-            description = item.get("description")
-            parent_id = item.get("parent_id")
-            work_id = item.get("id")
-            if parent_id:
-                parent_structure_code = await self.get_pf_parent_details(work_structure, processed_work, parent_id)
-                structure_code = await self.task.create(name, description, parent_structure_code)
-                processed_work[work_id] = (structure_code, name)
-                work_cache[work_name][name] = structure_code
-            else:
-                structure_code = await self.create(name, description)
-                project_id = structure_code
-                processed_work[work_id] = (structure_code, name)
-                work_cache[work_name]["self"] = structure_code
+        for level in levels:
+            structure_codes = await gather_bounded(
+                (create_and_report(item) for item in level), concurrency
+            )
+            for item, structure_code in zip(level, structure_codes):
+                name = item.get("name")
+                processed_work[item.get("id")] = (structure_code, name)
+                if item.get("parent_id"):
+                    structure_codes_by_name[name] = structure_code
+                else:
+                    project_id = structure_code
+                    structure_codes_by_name["self"] = structure_code
+            # Saved after every level so a partially created WBS can still be used
+            await work_cache.set(tenant, work_name, structure_codes_by_name)
 
         plan_page_url = PLAN_PAGE_URL.format(BASE_API_URL=BASE_API_URL, project_id=project_id)
         return {"type": "redirect", "data": plan_page_url}
 
-    @staticmethod
-    async def get_pf_parent_details(work_structure, processed_work, parent_id):
-        task = Task()
-        processed_parent = processed_work.get(parent_id)
-        if processed_work:
-            parent_structure_code = processed_parent[0]
-        else:
-            parent_details_in_request = find_details_in_dct(work_structure, "id", parent_id)
-            grand_parent_structure_code = Project.get_pf_parent_details(work_structure, processed_work, parent_details_in_request.get("id"))
-            
-            parent_structure_code = await task.create(parent_details_in_request.get("name"), parent_details_in_request.get("description"), grand_parent_structure_code)
-            processed_work[parent_id] = (parent_structure_code, parent_details_in_request.get("name"))
-        return parent_structure_code
-        
+    async def create_work_item(self, item: Dict[str, Any], processed_work: Dict[str, tuple]) -> str:
+        """Create a single WBS item, the project for root items or a task under its already created parent."""
+        name = item.get("name")
+        description = item.get("description")
+        parent_id = item.get("parent_id")
+        if parent_id:
+            parent_structure_code = processed_work[parent_id][0]
+            return await self.task.create(name, description, parent_structure_code)
+        return await self.create(name, description)
@@ -1,15 +1,18 @@
 import json
 from utils.http_client import make_api_request, HTTPMethod
+from utils.template_cache import fetch_structure_template, created_structure_code
+from utils.response_cache import invalidate_cached_responses
 from utils.constants import GET_STRUCTURE_URL, CREATE_URL
 
 
 class Task:
     async def get_structure_code(self, father_code: str):
-        return await make_api_request(GET_STRUCTURE_URL.format(father_code=father_code), HTTPMethod.GET)
+        return await fetch_structure_template(GET_STRUCTURE_URL, father_code)
         
     async def create(self, task_name: str, task_description: str, father_code: str):
         json_response = await self.get_structure_code(father_code)
-        structure_code = json_response.get("StructureCode")
+        if not json_response:
+            raise RuntimeError(f"Planview returned no structure template for the task '{task_name}' under {father_code}")
         
         payload = json_response
         payload["Description"] = task_name
@@ -19,4 +22,6 @@ class Task:
         }
 
         response = await make_api_request(CREATE_URL, HTTPMethod.POST, body=payload)
-        return structure_code
\ No newline at end of file
+        invalidate_cached_responses(CREATE_URL)
+        # Templates served from the cache have no StructureCode, the created work carries it
+        return created_structure_code(payload, response)
@@ -0,0 +1,232 @@
+"""Drive a running MCP server with concurrent clients and report throughput and latencies.
+
+Each client keeps one MCP session (SSE or streamable HTTP) and calls tools picked from a
+weighted mix until the duration is over. create_work's sampling request is answered with a
+synthetic WBS of `--wbs_size` items. A client whose mix allocates resources first creates the
+work it allocates on, untimed. With `--mock_url`, the upstream calls made during the run are read
+from the mock Planview's /__stats.
+
+    python loadtest/load_generator.py --url http://127.0.0.1:8080/sse --clients 20 --duration 30
+    python loadtest/load_generator.py --url http://127.0.0.1:8080/mcp --transport http \\
+        --mix get_strategy_detail=5,smart_timeentry=2,create_resource_allocation=2,create_work=1
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import timedelta
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from mcp import ClientSession, types
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+DEFAULT_MIX = "get_strategy_detail=5,smart_timeentry=2,create_resource_allocation=2,create_work=1"
+# Tool results that report a failure instead of raising, matched case insensitively
+FAILURE_MARKERS = ("unable to reach the endpoint", "something went wrong", "is not found")
+# Tools that send the client a sampling request, which stateless streamable HTTP cannot route back
+SAMPLING_TOOLS = {"create_work"}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def synthetic_wbs(work_name: str, size: int) -> dict:
+    """A project with epics, each epic with up to 9 stories, `size` items in total."""
+    items = [{"id": "project-1", "type": "project", "name": work_name, "description": "Load test project", "parent_id": None}]
+    epic = None
+    for n in range(1, size):
+        if epic is None or n % 10 == 1:
+            epic = f"epic-{n}"
+            items.append({"id": epic, "type": "epic", "name": f"Epic {n}", "description": "", "parent_id": "project-1"})
+        else:
+            items.append({"id": f"story-{n}", "type": "story", "name": f"Task {n}", "description": "", "parent_id": epic})
+    return {"items": items}
+
+def tool_failed(result: types.CallToolResult) -> bool:
+    """A tool call that raised, reported a failure, or failed some rows of a bulk call."""
+    if result.isError:
+        return True
+    text = " ".join(item.text for item in result.content if item.type == "text")
+    if any(marker in text.lower() for marker in FAILURE_MARKERS):
+        return True
+    try:
+        data = json.loads(text).get("data")
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(data, dict) and bool(data.get("failed"))
+
+def tool_arguments(tool: str, client: int, call: int, login_cert: str) -> dict:
+    if tool == "get_strategy_detail":
+        return {"id": str(random.randint(1, 50)), "PF_loginCert": login_cert}
+    if tool == "smart_timeentry":
+        return {"date": "2025-06-02", "PF_loginCert": login_cert}
+    if tool == "create_resource_allocation":
+        return {"resource_name": "Demo Ai", "work_name": f"Load work {client}", "task_name": "Task 2", "PF_loginCert": login_cert}
+    if tool == "create_work":
+        return {"work_type": "software project", "work_name": f"Load work {client}", "ctx": {}, "PF_loginCert": login_cert}
+    if tool == "add":
+        return {"a": client, "b": call}
+    return {}
+
+def percentile(sorted_values: List[float], share: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+def summarize(latencies: List[float], errors: int) -> dict:
+    values = sorted(latencies)
+    return {
+        "calls": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2) if values else None,
+        "max_ms": round(values[-1] * 1000, 2) if values else None,
+    }
+
+
+class LoadGenerator:
+    def __init__(
+        self, url: str, transport: str, mix: Dict[str, float], wbs_size: int, tenants: int, call_timeout: float = 60,
+        seed_url: Optional[str] = None,
+    ):
+        """`seed_url` is an /sse endpoint to create the allocated works on, for transports that cannot
+        carry create_work's sampling request (stateless streamable HTTP)."""
+        self.url = url
+        self.seed_url = seed_url
+        self.transport = transport
+        self.tools = list(mix)
+        self.weights = list(mix.values())
+        self.wbs_size = wbs_size
+        self.tenants = tenants
+        self.call_timeout = timedelta(seconds=call_timeout)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.failed_seeds = 0
+
+    def _streams(self):
+        if self.transport == "sse":
+            return sse_client(self.url)
+        return streamablehttp_client(self.url)
+
+    def _login_cert(self, client: int) -> str:
+        return f"loadtest-tenant-{client % self.tenants}"
+
+    async def seed_work(self, client: int):
+        """Create the work `client` allocates on, so the allocations reach the upstream write."""
+        try:
+            async with (sse_client(self.seed_url) if self.seed_url else self._streams()) as streams:
+                async with ClientSession(streams[0], streams[1], sampling_callback=self._sampling) as session:
+                    await session.initialize()
+                    arguments = tool_arguments("create_work", client, 0, self._login_cert(client))
+                    failed = tool_failed(await session.call_tool("create_work", arguments, read_timeout_seconds=self.call_timeout))
+        except Exception:
+            failed = True
+        # The allocations of the client then fail, and are counted as errors
+        self.failed_seeds += failed
+
+    async def _sampling(self, context, params: types.CreateMessageRequestParams) -> types.CreateMessageResult:
+        prompt = params.messages[0].content.text if params.messages else ""
+        work_name = prompt.split("work name: ", 1)[-1].split(".", 1)[0] if "work name: " in prompt else "Load work"
+        return types.CreateMessageResult(
+            role="assistant",
+            content=types.TextContent(type="text", text=json.dumps(synthetic_wbs(work_name, self.wbs_size))),
+            model="loadtest",
+        )
+
+    async def run_client(self, client: int, until: float, max_calls: Optional[int]):
+        async with self._streams() as streams:
+            async with ClientSession(streams[0], streams[1], sampling_callback=self._sampling) as session:
+                await session.initialize()
+                login_cert = self._login_cert(client)
+                call = 0
+                while time.monotonic() < until and (max_calls is None or call < max_calls):
+                    tool = random.choices(self.tools, self.weights)[0]
+                    arguments = tool_arguments(tool, client, call, login_cert)
+                    started = time.perf_counter()
+                    try:
+                        result = await session.call_tool(tool, arguments, read_timeout_seconds=self.call_timeout)
+                        failed = tool_failed(result)
+                    except Exception:
+                        failed = True
+                    self.latencies[tool].append(time.perf_counter() - started)
+                    if failed:
+                        self.errors[tool] += 1
+                    call += 1
+
+    async def run(self, clients: int, duration: float, max_calls: Optional[int] = None, mock_url: Optional[str] = None) -> dict:
+        if "create_resource_allocation" in self.tools:
+            # Out of the measured run
+            await asyncio.gather(*(self.seed_work(client) for client in range(clients)))
+        before = await _mock_stats(mock_url)
+        started = time.perf_counter()
+        until = time.monotonic() + duration
+        outcomes = await asyncio.gather(
+            *(self.run_client(client, until, max_calls) for client in range(clients)), return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        after = await _mock_stats(mock_url)
+
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        report = {
+            "url": self.url,
+            "transport": self.transport,
+            "clients": clients,
+            "failed_clients": sum(1 for outcome in outcomes if isinstance(outcome, BaseException)),
+            "failed_seeds": self.failed_seeds,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_per_s": round(len(all_latencies) / elapsed, 2),
+            **summarize(all_latencies, sum(self.errors.values())),
+            "per_tool": {tool: summarize(self.latencies[tool], self.errors[tool]) for tool in sorted(self.latencies)},
+        }
+        if before is not None and after is not None:
+            calls = {
+                endpoint: count - before["calls"].get(endpoint, 0)
+                for endpoint, count in after["calls"].items()
+            }
+            report["upstream"] = {
+                "calls": calls,
+                "total_calls": sum(calls.values()),
+                "injected_errors": sum(after["errors"].values()) - sum(before["errors"].values()),
+                "calls_per_tool_call": round(sum(calls.values()) / len(all_latencies), 2) if all_latencies else None,
+            }
+        return report
+
+async def _mock_stats(mock_url: Optional[str]) -> Optional[dict]:
+    if not mock_url:
+        return None
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{mock_url.rstrip('/')}/__stats")
+        return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running MCP server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/sse", help="/sse endpoint, or /mcp with --transport http")
+    parser.add_argument("--transport", choices=["sse", "http"], default="sse")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--calls", type=int, help="Stop each client after this many calls")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted tools, e.g. get_strategy_detail=5,create_work=1")
+    parser.add_argument("--wbs_size", type=int, default=10, help="Items of the WBS returned to create_work's sampling")
+    parser.add_argument("--tenants", type=int, default=4, help="Distinct PF_loginCert values spread over the clients")
+    parser.add_argument("--mock_url", help="Mock Planview base URL, to report upstream call counts")
+    parser.add_argument("--call_timeout", type=float, default=60, help="Seconds before a tool call counts as failed")
+    parser.add_argument("--seed_url", help="/sse endpoint to create the allocated works on, when --transport http is stateless")
+    args = parser.parse_args()
+
+    generator = LoadGenerator(args.url, args.transport, parse_mix(args.mix), args.wbs_size, args.tenants, args.call_timeout, args.seed_url)
+    report = asyncio.run(generator.run(args.clients, args.duration, args.calls, args.mock_url))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Local stand-in for the Planview endpoints the features call, for offline load tests.
+
+Every call waits `--latency_ms` (+/- `--jitter_ms`) and fails with a 503 with probability
+`--error_rate`. GET /__stats returns the calls per endpoint, POST /__reset clears them.
+
+Like Planview, `/new` hands out the StructureCode of the next work and the create POST must carry
+it. With `--codes_on_create`, a create without a StructureCode gets one minted instead, for servers
+run with TEMPLATE_SERVER_FIELDS_FROM_CREATE.
+
+    python loadtest/mock_planview.py --port 9100 --latency_ms 40 --jitter_ms 20 --error_rate 0.01
+    BASE_API_URL=http://127.0.0.1:9100/ python main.py --mode sse
+"""
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_mock_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, codes_on_create: bool = False) -> FastAPI:
+    app = FastAPI(title="Mock Planview")
+    calls = Counter()
+    errors = Counter()
+    structure_codes = itertools.count(100000)
+    # Handed out by /new and not used by a create yet
+    issued_codes = set()
+
+    def new_code() -> int:
+        code = next(structure_codes)
+        issued_codes.add(str(code))
+        return code
+
+    def created(body: dict):
+        code = body.get("StructureCode")
+        if code is None and codes_on_create:
+            return {**body, "StructureCode": str(next(structure_codes))}
+        if code not in issued_codes:
+            return JSONResponse({"Message": f"StructureCode {code!r} was not handed out by /new"}, status_code=400)
+        issued_codes.discard(code)
+        return body
+
+    @app.middleware("http")
+    async def inject_latency_and_errors(request: Request, call_next):
+        if request.url.path.startswith("/__"):
+            return await call_next(request)
+        endpoint = _endpoint_name(request.url.path)
+        calls[endpoint] += 1
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and random.random() < error_rate:
+            errors[endpoint] += 1
+            return JSONResponse({"Message": "Injected failure"}, status_code=503)
+        return await call_next(request)
+
+    @app.get("/internal-api/projects/new")
+    async def new_project():
+        return _template(new_code())
+
+    @app.post("/internal-api/projects")
+    async def create_project(request: Request):
+        return created(await request.json())
+
+    @app.get("/internal-api/works/new")
+    async def new_work(fatherCode: str = ""):
+        return {**_template(new_code()), "Parent": {"StructureCode": fatherCode}}
+
+    @app.post("/internal-api/works")
+    async def create_work(request: Request):
+        return created(await request.json())
+
+    @app.post("/internal-api/strategies/byId/{structure_code}")
+    async def strategy(structure_code: str):
+        return {
+            "StructureCode": structure_code,
+            "Description": f"Strategy {structure_code}",
+            "StrategyType": {"Description": "Portfolio"},
+            "Status": {"Description": "Active"},
+            "TargetStart": "2025-01-01",
+            "TargetFinish": "2025-12-31",
+            "Parent": {"Description": "Enterprise"},
+        }
+
+    @app.put("/internal-api/timesheet/smart-timeentry")
+    async def smart_timeentry():
+        return {"Status": "Completed", "Entries": 5}
+
+    @app.post("/services/AllocateListAttributeServiceJson.svc/InsertRow")
+    async def insert_allocation(request: Request):
+        await request.body()
+        return {"d": {"Success": True, "Key": str(next(structure_codes))}}
+
+    @app.get("/__stats")
+    async def stats():
+        return {"calls": dict(calls), "errors": dict(errors), "total_calls": sum(calls.values())}
+
+    @app.post("/__reset")
+    async def reset():
+        calls.clear()
+        errors.clear()
+        return {"status": "reset"}
+
+    return app
+
+def _endpoint_name(path: str) -> str:
+    # One series per endpoint, not per strategy id
+    if path.startswith("/internal-api/strategies/byId/"):
+        return "/internal-api/strategies/byId/{id}"
+    return path
+
+def _template(structure_code: int) -> dict:
+    return {
+        "StructureCode": str(structure_code),
+        "Description": "",
+        "Parent": {"StructureCode": "9"},
+        "Attributes": {},
+        "Status": {"Description": "Proposed"},
+        "ScheduleStart": "2025-01-01",
+        "ScheduleFinish": "2025-12-31",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Planview backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency_ms", type=float, default=40)
+    parser.add_argument("--jitter_ms", type=float, default=20)
+    parser.add_argument("--error_rate", type=float, default=0)
+    parser.add_argument("--codes_on_create", action="store_true", help="Mint the StructureCode of a create that carries none")
+    args = parser.parse_args()
+    app = build_mock_app(args.latency_ms, args.jitter_ms, args.error_rate, args.codes_on_create)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""One command offline load test: starts the mock Planview and the MCP server (SSE + streamable
+HTTP, stateless when several workers), then drives both transports and prints one JSON report.
+
+    python loadtest/run.py --workers 4 --clients 40 --duration 30 --latency_ms 40 --error_rate 0.01
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+PATH = Path(__file__).resolve().parents[1]
+sys.path.append(str(PATH))
+
+from loadtest.load_generator import DEFAULT_MIX, SAMPLING_TOOLS, LoadGenerator, parse_mix
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Nothing listening on {port} after {timeout}s")
+
+def stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the MCP server against a mock Planview and load test it")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mock_port", type=int, default=9100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--transports", nargs="+", choices=["sse", "http"], default=["sse", "http"])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--wbs_size", type=int, default=10)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--latency_ms", type=float, default=40)
+    parser.add_argument("--jitter_ms", type=float, default=20)
+    parser.add_argument("--error_rate", type=float, default=0)
+    parser.add_argument("--codes_on_create", action="store_true",
+                        help="The mock returns the StructureCode on create, so the server serves templates from its cache")
+    args = parser.parse_args()
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}/"
+    env = {**os.environ, "BASE_API_URL": mock_url, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    mock_args = [sys.executable, str(PATH / "loadtest" / "mock_planview.py"), "--port", str(args.mock_port),
+                 "--latency_ms", str(args.latency_ms), "--jitter_ms", str(args.jitter_ms), "--error_rate", str(args.error_rate)]
+    if args.codes_on_create:
+        mock_args.append("--codes_on_create")
+        env["TEMPLATE_SERVER_FIELDS_FROM_CREATE"] = "true"
+    # A work created on one worker is allocated on from any other
+    work_cache_dir = tempfile.TemporaryDirectory()
+    env.setdefault("WORK_CACHE_DB", str(Path(work_cache_dir.name) / "work_cache.db"))
+    mock = subprocess.Popen(mock_args, cwd=PATH, stdout=sys.stderr)
+    server_args = [sys.executable, str(PATH / "main.py"), "--mode", "sse", "--streamable_http", "--port", str(args.port),
+                   "--workers", str(args.workers), "--login_cert", "loadtest"]
+    if args.workers > 1:
+        server_args.append("--stateless")
+    # The report owns stdout, the processes log to stderr
+    server = subprocess.Popen(server_args, cwd=PATH, env=env, stdout=sys.stderr)
+    try:
+        wait_for_port(args.mock_port, mock)
+        wait_for_port(args.port, server)
+        # Workers start one by one, leave them time to all accept connections
+        time.sleep(1 + args.workers)
+        reports = []
+        for transport in args.transports:
+            url = f"http://127.0.0.1:{args.port}/{'sse' if transport == 'sse' else 'mcp'}"
+            mix = parse_mix(args.mix)
+            if transport == "http" and args.workers > 1:
+                # Stateless streamable HTTP cannot carry the sampling round trip back to the tool call
+                mix = {tool: weight for tool, weight in mix.items() if tool not in SAMPLING_TOOLS}
+            # Works to allocate on are created over SSE when streamable HTTP cannot carry the sampling
+            seed_url = f"http://127.0.0.1:{args.port}/sse" if transport == "http" and args.workers > 1 else None
+            generator = LoadGenerator(url, transport, mix, args.wbs_size, args.tenants, seed_url=seed_url)
+            reports.append(asyncio.run(generator.run(args.clients, args.duration, mock_url=mock_url)))
+    finally:
+        stop(server)
+        stop(mock)
+        work_cache_dir.cleanup()
+    json.dump({"workers": args.workers, "latency_ms": args.latency_ms, "error_rate": args.error_rate, "runs": reports}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,18 @@ import argparse
 import importlib
 from pathlib import Path
 import pkgutil
-import uvicorn
+import logging
 import asyncio
-from fastmcp import FastMCP
 
 PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 
-from utils.fastapi_factory import build_mcp_fastapi_app
 from utils.shared_mcp import set_mcp, Session, mcp
+from utils.http_client import configure_http_client
+from utils.log import configure_logging
+from utils.tool_manifest import LAZY_TOOLS, TOOL_MANIFEST, LazyTools, build_manifest, write_manifest, load_manifest
+
+logger = logging.getLogger("main")
 
 
 def discover_tool_modules() -> list[str]:
@@ -27,11 +30,55 @@ def load_tool_module(module_name: str):
     """Dynamically import and return the tool module."""
     return importlib.import_module(f"tools.{module_name}")
 
-async def print_registered_tools(mcp):
-    tools = await mcp.list_tools()
-    print("[MCP] Available tools:")
-    for t in tools:
-        print("-", t.name)
+async def print_registered_tools(list_tools):
+    tools = await list_tools()
+    logger.info("[MCP] Available tools: %s", ", ".join(t.name for t in tools))
+
+def load_tools(tool_modules: list[str]):
+    """Load the tool modules, or only the ones the manifest cannot stand in for.
+    Returns the list_tools coroutine to use, None when a module failed to load."""
+    list_tools = mcp.list_tools
+    manifest = load_manifest() if LAZY_TOOLS else None
+    try:
+        if manifest is not None:
+            lazy_tools = LazyTools(mcp, manifest, tool_modules)
+            lazy_tools.install()
+            list_tools = lazy_tools.list_tools
+        else:
+            for tool in tool_modules:
+                load_tool_module(tool)
+    except Exception as e:
+        logger.exception(f"❌ Failed to load tool(s)': {e}")
+        return None
+    return list_tools
+
+def build_app(args, worker=None):
+    """The FastAPI app for the sse / http modes, with the transports asked for on the command line."""
+    from utils.fastapi_factory import build_mcp_fastapi_app
+    return build_mcp_fastapi_app(
+        mcp._mcp_server,
+        debug=True,
+        worker=worker,
+        sse=args.mode == "sse",
+        streamable_http=args.mode == "http" or args.streamable_http,
+        stateless=args.stateless,
+        json_response=args.json_response,
+    )
+
+def run_worker(args, worker, sock):
+    """Entry point of one worker process (see utils.workers.serve_workers)."""
+    import uvicorn
+    from utils.workers import bind_worker_socket, WORKER_STARTUP_FAILED
+
+    configure_logging(args.mode)
+    Session.login_cert = args.login_cert
+    configure_http_client(pool_size=args.pool_size, http2=args.http2)
+    if load_tools(args.tools if args.tools else discover_tool_modules()) is None:
+        sys.exit(WORKER_STARTUP_FAILED)
+
+    app = build_app(args, worker)
+    server = uvicorn.Server(uvicorn.Config(app, log_config=None))
+    server.run(sockets=[sock, bind_worker_socket(worker)])
 
 def main():
     parser = argparse.ArgumentParser(description="Run Portfolio MCP server")
@@ -40,34 +87,56 @@ def main():
     parser.add_argument("--login_cert")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pool_size", type=int, help="Max upstream connections per host (default: $HTTP_POOL_SIZE or 100)")
+    parser.add_argument("--http2", action="store_true", default=None, help="Use HTTP/2 for upstream calls (requires the 'h2' package)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")), help="Worker processes sharing --port (sse and http modes)")
+    parser.add_argument("--streamable_http", action="store_true", help="Also serve streamable HTTP on /mcp next to SSE (sse mode)")
+    parser.add_argument("--stateless", action="store_true", help="Streamable HTTP without sessions, any worker or replica can serve any request")
+    parser.add_argument("--json_response", action="store_true", help="Streamable HTTP answers with JSON instead of an SSE stream")
+    parser.add_argument("--build_manifest", action="store_true", help=f"Write the tool manifest ({TOOL_MANIFEST}) and exit")
     args = parser.parse_args()
+    serves_streamable_http = args.mode == "http" or (args.mode == "sse" and args.streamable_http)
+    if serves_streamable_http and args.workers > 1 and not args.stateless:
+        # Streamable HTTP sessions live in one process and nothing routes them back to it
+        parser.error("streamable HTTP with --workers > 1 requires --stateless")
+    configure_logging(args.mode)
 
     tool_modules = args.tools if args.tools else discover_tool_modules()
     Session.login_cert = args.login_cert
+    configure_http_client(pool_size=args.pool_size, http2=args.http2)
 
-    # Step 1: Load the tool module
-    try:
-        for tool in tool_modules:
-            load_tool_module(tool)
-    except Exception as e:
-        print(f"❌ Failed to load tool(s)': {e}")
+    if args.build_manifest:
+        write_manifest(build_manifest(mcp, discover_tool_modules()))
+        logger.info(f"[MCP] Tool manifest written to {TOOL_MANIFEST}")
+        return
+
+    if args.mode in ("sse", "http") and args.workers > 1:
+        # Every worker loads the tools and serves its own sessions
+        from utils.workers import serve_workers
+        logger.info(f"[MCP] Launching {args.workers} {args.mode} workers at http://localhost:{args.port}")
+        sys.exit(serve_workers(run_worker, args, args.host, args.port, args.workers))
+
+    # Step 1: Load the tool modules, or only the ones the manifest cannot stand in for
+    list_tools = load_tools(tool_modules)
+    if list_tools is None:
         return
 
     # Step 2: Run based on mode
-    if args.mode == "sse":
-        asyncio.run(print_registered_tools(mcp))
+    if args.mode in ("sse", "http"):
+        # Only these modes need the web stack, keep it out of stdio startups
+        import uvicorn
+
+        asyncio.run(print_registered_tools(list_tools))
         url = f"http://localhost:{args.port}"
-        print(f"[MCP] Launching FastAPI SSE server at {url}")
+        transports = " + ".join(name for name, on in (("SSE", args.mode == "sse"), ("streamable HTTP", serves_streamable_http)) if on)
+        logger.info(f"[MCP] Launching FastAPI {transports} server at {url}")
 
         # import webbrowser
         # webbrowser.open_new_tab(url)
 
-        app = build_mcp_fastapi_app(mcp._mcp_server, debug=True)
-        uvicorn.run(app, host=args.host, port=args.port)
-    elif args.mode == "http":
-        mcp.run(transport="streamable-http")
+        uvicorn.run(build_app(args), host=args.host, port=args.port, log_config=None)
     else:
-        print("[Portfolio MCP] Running in stdio (CLI) mode...")
+        logger.info("[Portfolio MCP] Running in stdio (CLI) mode...")
         mcp.run()
 
 if __name__ == "__main__":
@@ -1,37 +1,90 @@
 import sys
-from typing import Optional
+import logging
+from typing import Optional, List, Dict, Any
+from pydantic import BaseModel
 
 from pathlib import Path
 PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 
-from utils.shared_mcp import mcp, Session, work_cache
-from features.allocation import Allocation
+from utils.shared_mcp import mcp, work_cache
+from utils.http_client import tenant_key
+from utils.request_context import request_context, deadline_after, TOOL_DEADLINE
+from features.allocation import Allocation, ALLOCATION_RESOURCES, resource_code_of
+
+logger = logging.getLogger(__name__)
 
 @mcp.tool()
 async def create_team_allocation(team_name: str, start_date: str, end_date: str) -> str:
     pass
 
+class ResourceTaskPair(BaseModel):
+    resource_name: str
+    work_name: str
+    task_name: str
+
+async def resolve_allocation_codes(resource_name: str, work_name: str, task_name: str, login_cert: Optional[str] = None) -> Dict[str, str]:
+    """Look up the resource code, and the project and task structure codes of a work created by this tenant.
+
+    Returns an "error" message instead of the codes when the resource, the work or its task is unknown.
+    """
+    resource_code = resource_code_of(resource_name)
+    if not resource_code:
+        return {"error": f"The resource '{resource_name}' is not found. Known resources: {', '.join(ALLOCATION_RESOURCES)}."}
+    work_details = await work_cache.get(tenant_key(login_cert), work_name)
+    if not work_details.get("self"):
+        return {"error": f"The work '{work_name}' is not found. Are you sure you have created the work in the current session?"}
+    task_id = work_details.get(task_name)
+    if not task_id:
+        return {"error": f"The task '{task_name}' is not found in the work '{work_name}'."}
+    return {"project_code": work_details["self"], "task_code": task_id, "resource_code": resource_code}
+
 @mcp.tool()
 async def create_resource_allocation(resource_name: str, work_name:str, task_name:str, PF_loginCert: Optional[str] = None) -> str:
     """
     Create an Allocation under a task for a resource or assign a task to a resource
     """
-    work_details = work_cache.get(work_name, {})
-    # if not work_details:
-    #     return {"type": "text", "data": "The Work details is not found. Are you sure you have created the work in the current session?"}
-    task_id = work_details.get(task_name) or "20276"
-    project_id = work_details.get('self') or "20276"
-
-    # task_id = "20276"
-    # project_id = "20276"
-    resource_code = "20556"
+    codes = await resolve_allocation_codes(resource_name, work_name, task_name, PF_loginCert)
+    if "error" in codes:
+        return {"type": "text", "data": codes["error"]}
+    project_id, task_id, resource_code = codes["project_code"], codes["task_code"], codes["resource_code"]
     allocation = Allocation()
-    Session.login_cert = PF_loginCert
-    response = await allocation.create(project_id, task_id, resource_code)
-    print(f"Allocation for resource {resource_name} created uner the work: {project_id}")
+    with request_context(login_cert=PF_loginCert, deadline=deadline_after(TOOL_DEADLINE)):
+        response = await allocation.create(project_id, task_id, resource_code, resource_name)
+    logger.info("Allocation requested", extra={"resource_name": resource_name, "project_code": project_id, "result": response})
     return {"type": "reload", "data": response}
 
+@mcp.tool()
+async def create_resource_allocations(allocations: List[ResourceTaskPair], PF_loginCert: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Create Allocations for several resources at once, e.g. to staff a whole project in one call.
+    Each entry assigns one resource to one task of a work.
+
+    Entries whose resource, work or task is unknown are not created, they come back failed.
+
+    Note:
+        The parameter 'PF_loginCert' is not required from the user. It will be fetched internally by the system.
+    """
+    rows = [
+        {"resource_name": pair.resource_name, "task_name": pair.task_name, **await resolve_allocation_codes(pair.resource_name, pair.work_name, pair.task_name, PF_loginCert)}
+        for pair in allocations
+    ]
+    resolved = [row for row in rows if "error" not in row]
+    created_rows = iter([])
+    if resolved:
+        with request_context(login_cert=PF_loginCert, deadline=deadline_after(TOOL_DEADLINE)):
+            created_rows = iter(await Allocation().create_many(resolved))
+    results = [
+        {**row, "status": "failed", "detail": row["error"]} if "error" in row else next(created_rows)
+        for row in rows
+    ]
+    created = sum(1 for row in results if row["status"] == "created")
+    summary = [
+        {"resource_name": row["resource_name"], "task_name": row["task_name"], "status": row["status"], "detail": row["detail"]}
+        for row in results
+    ]
+    return {"type": "reload", "data": {"created": created, "failed": len(results) - created, "rows": summary}}
+
 
 # if __name__ == '__main__':
 #     import asyncio
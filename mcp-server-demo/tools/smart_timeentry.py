@@ -8,6 +8,7 @@ PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 from utils.http_client import format_strategy_summary, make_api_request, BASE_API_URL, HTTPMethod
 from utils.shared_mcp import mcp
+from utils.request_context import request_context, deadline_after, TOOL_DEADLINE
 from datetime import datetime
 
 @mcp.tool()
@@ -20,8 +21,8 @@ async def smart_timeentry(date: str, PF_loginCert: Optional[str] = None) -> Dict
         The parameter 'PF_loginCert' is not required from the user. It will be fetched internally by the system.
     """
     endpoint = "/internal-api/timesheet/smart-timeentry"
-    cookies = {"LoginCert": PF_loginCert} if PF_loginCert else None
-    data = await make_api_request(endpoint, method=HTTPMethod.PUT, cookies=cookies)
+    with request_context(login_cert=PF_loginCert, deadline=deadline_after(TOOL_DEADLINE)):
+        data = await make_api_request(endpoint, method=HTTPMethod.PUT)
 
     if not data:
         return f"Unable to reach the endpoint: {endpoint}"
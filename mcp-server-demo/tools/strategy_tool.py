@@ -7,7 +7,12 @@ PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 
 from utils.http_client import format_strategy_summary, make_api_request, HTTPMethod
-from utils.shared_mcp import mcp, Session
+from utils.shared_mcp import mcp
+from utils.request_context import request_context, deadline_after, TOOL_DEADLINE
+from utils.response_cache import cacheable_endpoint
+
+# Strategy details are read only, identical concurrent lookups share one upstream call
+cacheable_endpoint("/internal-api/strategies/byId/")
 
 @mcp.tool()
 async def get_strategy_detail(
@@ -24,8 +29,8 @@ async def get_strategy_detail(
         The parameter 'PF_loginCert' is not required from the user. It will be fetched internally by the system.
     """
     endpoint = f"/internal-api/strategies/byId/{id}"
-    Session.login_cert = PF_loginCert
-    data = await make_api_request(endpoint, method=HTTPMethod.POST)
+    with request_context(login_cert=PF_loginCert, deadline=deadline_after(TOOL_DEADLINE)):
+        data = await make_api_request(endpoint, method=HTTPMethod.POST)
 
     if not data:
         return f"Unable to reach the endpoint: {endpoint}"
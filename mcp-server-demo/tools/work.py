@@ -1,3 +1,4 @@
+import os
 import sys
 import json
 from typing import Dict, Any, Optional
@@ -9,11 +10,14 @@ from dotenv import load_dotenv
 PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 
-from utils.shared_mcp import mcp, Session
+from utils.shared_mcp import mcp
+from utils.request_context import request_context, deadline_after
 from features.project import Project
 from utils.helpers import is_string_json
 
 load_dotenv()  # load environment variables from .env
+# Creating a whole WBS takes many upstream calls, so it gets a larger budget than the other tools
+WORK_TOOL_DEADLINE = float(os.getenv("WORK_TOOL_DEADLINE", "600"))
 
 
 @mcp.tool()
@@ -47,24 +51,32 @@ async def create_work(work_type: str, work_name: str, ctx: Context, PF_loginCert
         }
       ]
     }
-    Session.login_cert = PF_loginCert
     str_format_work = json.dumps(format_work)
     messages = [{"role": "user", "content": f"Create a project structure for the following work type: {work_type} and work name: {work_name}. If the name is not provided, use the work type as the name. Please return the project structure in json, in the following format \
             : {str_format_work}. I want the result to not be in nested json. I want to know the immediate parent of an item. Don't response with anything else. Only send the json response"}]
     messages = messages[0]["content"]
-    try:
-      ctx.fastmcp = mcp
-      response = await ctx.sample(messages, model_preferences="claude-3-5-sonnet-20241022", max_tokens=4000)
+    with request_context(login_cert=PF_loginCert, deadline=deadline_after(WORK_TOOL_DEADLINE)):
+      try:
+        ctx.fastmcp = mcp
+        # First feedback goes out before the (slow) structure generation
+        await ctx.report_progress(0, None, f"Generating the work structure for '{work_name or work_type}'")
+        response = await ctx.sample(messages, model_preferences="claude-3-5-sonnet-20241022", max_tokens=4000)
 
-      project = Project()
-      first_result_content = response.text
-      json_response = is_string_json(first_result_content)
+        project = Project()
+        first_result_content = response.text
+        json_response = is_string_json(first_result_content)
       
-      if json_response:
-        json_result = json.loads(first_result_content)
-        return await project.create_work_and_wbs_in_pf(json_result, work_name)
-    except Exception as e:
-      return {"type": "text", "data": f"Something Went Wrong when creating the work: {e}"}
+        if json_response:
+          json_result = json.loads(first_result_content)
+
+          async def report_created(done, total, item, structure_code):
+            await ctx.report_progress(
+              done, total, f"Created {item.get('type') or 'work'} '{item.get('name')}' ({structure_code}) - {done}/{total}"
+            )
+
+          return await project.create_work_and_wbs_in_pf(json_result, work_name, on_progress=report_created)
+      except Exception as e:
+        return {"type": "text", "data": f"Something Went Wrong when creating the work: {e}"}
 
 
 # generated_payload = {"items": [{"id": "project-1", "type": "project", "name": "Food Delivery App", "description": "Mobile application for food ordering and delivery service", "parent_id": None}, {"id": "epic-1", "type": "epic", "name": "User App Development", "description": "Customer-facing mobile application development", "parent_id": "project-1"}, {"id": "epic-2", "type": "epic", "name": "Restaurant Portal", "description": "Web portal for restaurant partners to manage orders", "parent_id": "project-1"}, {"id": "epic-3", "type": "epic", "name": "Driver App Development", "description": "Mobile application for delivery drivers", "parent_id": "project-1"}, {"id": "epic-4", "type": "epic", "name": "Backend System", "description": "Server-side development and database management", "parent_id": "project-1"}, {"id": "story-1", "type": "story", "name": "User Registration", "description": "Implementation of user registration and authentication", "parent_id": "epic-1"}, {"id": "story-2", "type": "story", "name": "Restaurant Browse", "description": "Browse and search functionality for restaurants", "parent_id": "epic-1"}, {"id": "story-3", "type": "story", "name": "Order Management", "description": "Place, track, and manage food orders", "parent_id": "epic-1"}, {"id": "story-4", "type": "story", "name": "Restaurant Dashboard", "description": "Dashboard for restaurants to view and manage orders", "parent_id": "epic-2"}, {"id": "story-5", "type": "story", "name": "Menu Management", "description": "Tools for restaurants to manage their menu items", "parent_id": "epic-2"}, {"id": "story-6", "type": "story", "name": "Driver Registration", "description": "Driver onboarding and verification system", "parent_id": "epic-3"}, {"id": "story-7", "type": "story", "name": "Delivery Management", "description": "Accept and manage delivery assignments", "parent_id": "epic-3"}, {"id": "story-8", "type": "story", "name": "API Development", "description": "Development of REST APIs for all services", "parent_id": "epic-4"}, {"id": "story-9", "type": "story", "name": "Database Design", "description": "Design and implementation of database schema", "parent_id": "epic-4"}, {"id": "story-10", "type": "story", "name": "Payment Integration", "description": "Integration with payment gateway services", "parent_id": "epic-4"}]}
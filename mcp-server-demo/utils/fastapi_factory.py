@@ -1,35 +1,105 @@
+from typing import Optional
+from contextlib import asynccontextmanager, AsyncExitStack
 from fastapi import FastAPI, Request
-from starlette.responses import Response
+from starlette.responses import Response, PlainTextResponse
 from mcp.server import Server
 from mcp.server.sse import SseServerTransport
-from mcp.server.streamable_http import StreamableHTTPServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 
-def build_mcp_fastapi_app(mcp_server: Server, *, debug: bool = False) -> FastAPI:
-    """Reusable FastAPI app builder for any MCP server."""
-    sse = SseServerTransport("/messages/")
+from utils.http_client import start_http_client, close_http_client
+from utils.metrics import render_metrics, sse_sessions, register_collector, set_constant_labels
+from utils.workers import WorkerInfo, MessageRouter
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep one pooled upstream client (and the streamable HTTP sessions) open for the lifetime of the server."""
+    await start_http_client()
+    try:
+        async with AsyncExitStack() as stack:
+            if app.state.session_manager is not None:
+                await stack.enter_async_context(app.state.session_manager.run())
+            yield
+    finally:
+        await close_http_client()
+        if app.state.message_router is not None:
+            await app.state.message_router.aclose()
+
+def build_mcp_fastapi_app(
+    mcp_server: Server,
+    *,
+    debug: bool = False,
+    worker: Optional[WorkerInfo] = None,
+    sse: bool = True,
+    streamable_http: bool = False,
+    stateless: bool = False,
+    json_response: bool = False,
+) -> FastAPI:
+    """Reusable FastAPI app builder for any MCP server.
+
+    Serves the SSE transport (`/sse` + `/messages`) and/or the streamable HTTP one (`/mcp`).
+    `stateless` streamable HTTP keeps no session between requests, so any process or replica can
+    answer any request; `json_response` answers with plain JSON instead of an SSE stream.
+
+    `worker` is set when the app runs in one of several worker processes (see utils.workers):
+    SSE message POSTs that reach the wrong worker are then forwarded to the one owning the session.
+    """
     app = FastAPI(
         debug=debug,
         title="MCP Tool Server",
         version="1.0",
+        lifespan=lifespan,
     )
-
-    @app.get("/sse")
-    async def handle_sse(request: Request) -> Response:
-        async with sse.connect_sse(
-            request.scope,
-            request.receive,
-            request._send,
-        ) as (read_stream, write_stream):
-            await mcp_server.run(
-                read_stream,
-                write_stream,
-                mcp_server.create_initialization_options()
-            )
-
-    app.mount("/messages", sse.handle_post_message)
+    app.state.message_router = None
+    app.state.session_manager = None
+    if worker:
+        # Every worker counts on its own, tell their series apart
+        set_constant_labels(worker=worker.index)
+    if sse:
+        _mount_sse(app, mcp_server, worker)
+    if streamable_http:
+        app.state.session_manager = StreamableHTTPSessionManager(
+            app=mcp_server, json_response=json_response, stateless=stateless,
+        )
+        app.mount("/mcp", app.state.session_manager.handle_request)
 
     @app.get("/")
     def health_check():
         return {"status": "MCP Server Ready 🟢"}
 
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
     return app
+
+def _mount_sse(app: FastAPI, mcp_server: Server, worker: Optional[WorkerInfo]):
+    sse = SseServerTransport(worker.message_endpoint if worker else "/messages/")
+
+    @app.get("/sse")
+    async def handle_sse(request: Request) -> Response:
+        sse_sessions.inc()
+        try:
+            async with sse.connect_sse(
+                request.scope,
+                request.receive,
+                request._send,
+            ) as (read_stream, write_stream):
+                await mcp_server.run(
+                    read_stream,
+                    write_stream,
+                    mcp_server.create_initialization_options()
+                )
+        finally:
+            sse_sessions.dec()
+
+    if worker:
+        app.state.message_router = MessageRouter(worker, sse.handle_post_message)
+        register_collector(lambda: [
+            "# HELP mcp_sse_messages_forwarded_total Messages forwarded to the worker owning their SSE session",
+            "# TYPE mcp_sse_messages_forwarded_total counter",
+            f"mcp_sse_messages_forwarded_total {app.state.message_router.forwarded}",
+        ])
+        app.mount("/messages", app.state.message_router)
+    else:
+        app.mount("/messages", sse.handle_post_message)
+
@@ -1,7 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Iterable, List
+
+
 def find_details_in_dct(payload, key, value):
     for item in payload:
         if item.get(key) == value:
             return item
         
 def is_string_json(str_value):
-    return str_value.startswith("{") and str_value.endswith("}") or str_value.startswith("[") and str_value.endswith("]")
\ No newline at end of file
+    return str_value.startswith("{") and str_value.endswith("}") or str_value.startswith("[") and str_value.endswith("]")
+
+def index_work_items(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Index the work structure items by id, rejecting duplicated ids."""
+    indexed = {}
+    for item in items:
+        work_id = item.get("id")
+        if work_id in indexed:
+            raise ValueError(f"Duplicated work item id '{work_id}' in the work structure")
+        indexed[work_id] = item
+    return indexed
+
+def order_work_items_by_level(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group the work structure items by depth so that every parent comes before its children.
+
+    Raises ValueError when an item references a parent that is not in the structure or
+    when the parent links form a cycle.
+    """
+    indexed = index_work_items(items)
+    children: Dict[Any, List[Dict[str, Any]]] = {}
+    roots = []
+    for item in items:
+        parent_id = item.get("parent_id")
+        if not parent_id:
+            roots.append(item)
+        elif parent_id not in indexed:
+            raise ValueError(f"Work item '{item.get('id')}' references unknown parent '{parent_id}'")
+        else:
+            children.setdefault(parent_id, []).append(item)
+
+    levels = []
+    current = roots
+    placed = 0
+    while current:
+        levels.append(current)
+        placed += len(current)
+        current = [child for item in current for child in children.get(item.get("id"), [])]
+
+    if placed != len(items):
+        # Whatever was not reached from a root sits on a parent cycle
+        reached = {item.get("id") for level in levels for item in level}
+        cyclic = [work_id for work_id in indexed if work_id not in reached]
+        raise ValueError(f"Work items {cyclic} form a parent cycle")
+    return levels
+
+async def gather_bounded(coros: Iterable[Awaitable[Any]], limit: int) -> List[Any]:
+    """Run the awaitables concurrently with at most `limit` of them in flight, keeping their order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
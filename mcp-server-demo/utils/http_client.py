@@ -1,20 +1,40 @@
+import time
+import asyncio
+import hashlib
 from enum import Enum
+from http.cookiejar import DefaultCookiePolicy
 from typing import Any, Optional
 import httpx
 from pathlib import Path
 import sys
 import os
+import logging
 from dotenv import load_dotenv
 
 PATH = Path(__file__).resolve().parents[1]
 sys.path.append(str(PATH))
 
 from utils.shared_mcp import Session
+from utils.request_context import get_request_context, remaining_time
+from utils.response_cache import response_cache, single_flight, cache_ttl_for, request_key
+from utils.metrics import upstream_requests, upstream_latency, upstream_in_flight
+from utils.resilience import (
+    UPSTREAM_TIMEOUT, UPSTREAM_MAX_RETRIES, UPSTREAM_HEDGE_READS, stats,
+    endpoint_key, latency_window, adaptive_timeout, hedge_delay, hedged, backoff_delay,
+)
+
+logger = logging.getLogger(__name__)
 
 load_dotenv() 
 LOGIN_CERT = os.getenv("LOGIN_CERT")
 BASE_API_URL = os.getenv("BASE_API_URL") or "http://localhost/planview/"
 
+# Upstream connection pool settings, overridable from the environment or the CLI
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
 class HTTPMethod(str, Enum):
     GET = "GET"
     POST = "POST"
@@ -22,6 +42,7 @@ class HTTPMethod(str, Enum):
     PATCH = "PATCH"
     DELETE = "DELETE"
     
+IDEMPOTENT_METHODS = {HTTPMethod.GET, HTTPMethod.PUT, HTTPMethod.DELETE}
 
 
 DEFAULT_HEADERS ={
@@ -33,48 +54,218 @@ DEFAULT_HEADERS ={
 Default_Cookies = {
 }
 
+_client: Optional[httpx.AsyncClient] = None
+_pool_settings = {
+    "pool_size": HTTP_POOL_SIZE,
+    "max_keepalive": HTTP_MAX_KEEPALIVE,
+    "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+    "http2": HTTP2_ENABLED,
+}
+
+def configure_http_client(
+    pool_size: Optional[int] = None,
+    max_keepalive: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    http2: Optional[bool] = None,
+):
+    """Override the pool settings. Must be called before the client is started."""
+    overrides = {
+        "pool_size": pool_size,
+        "max_keepalive": max_keepalive,
+        "keepalive_expiry": keepalive_expiry,
+        "http2": http2,
+    }
+    _pool_settings.update({key: value for key, value in overrides.items() if value is not None})
+
+def current_login_cert() -> Optional[str]:
+    """LoginCert used for upstream calls when the caller does not pass one explicitly.
+
+    The cert bound to the current tool call wins over the process wide default (--login_cert / LOGIN_CERT).
+    """
+    return get_request_context().login_cert or Session.login_cert or LOGIN_CERT
+
+def tenant_key(login_cert: Optional[str] = None) -> str:
+    """Stable, non reversible key identifying the tenant behind a LoginCert, safe to use in cache keys."""
+    login_cert = login_cert or current_login_cert() or ""
+    return hashlib.sha256(login_cert.encode()).hexdigest()[:16]
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = _pool_settings["http2"]
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=_pool_settings["pool_size"],
+        max_keepalive_connections=min(_pool_settings["max_keepalive"], _pool_settings["pool_size"]),
+        keepalive_expiry=_pool_settings["keepalive_expiry"],
+    )
+    client = httpx.AsyncClient(limits=limits, http2=http2, headers=DEFAULT_HEADERS)
+    # The client is shared by every tenant, so never keep cookies set by the upstream
+    client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return client
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the process wide upstream client. Safe to call more than once."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def close_http_client():
+    """Close the process wide upstream client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily when no lifecycle hook started it (e.g. stdio mode)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
 async def make_api_request(
     endpoint: str,
     method: HTTPMethod = HTTPMethod.GET,
     params: Optional[dict[str, Any]] = None,
     body: Optional[dict[str, Any]] = None,
+    content: Optional[str | bytes] = None,
     headers: Optional[dict[str, str]] = None,
     cookies: Optional[dict[str, str]] = None,
-    timeout: float = 40.0,
+    timeout: Optional[float] = None,
+    cache_ttl: Optional[float] = None,
+    coalesce: Optional[bool] = None,
+    hedge: Optional[bool] = None,
 ) -> Optional[dict[str, Any]]:
-    """Make an HTTP request to the configured API endpoint."""
+    """Make an HTTP request to the configured API endpoint.
+
+    `content` sends an already serialized JSON body as is, instead of encoding `body`.
+    Reads can opt in to a short lived response cache (`cache_ttl`) and to the coalescing of identical
+    in-flight requests (`coalesce`); both default to what the endpoint declared with `cacheable_endpoint`.
+
+    `timeout` caps each attempt, which is further limited by the deadline of the current tool call.
+    Idempotent requests (and declared reads) are also limited by the endpoint's adaptive timeout, and are
+    retried with jittered backoff on 5xx and connection errors; reads can be hedged past the endpoint's
+    p95 (`hedge`). Other writes keep the caller's timeout and are sent once.
+    """
     merged_headers = {**DEFAULT_HEADERS, **(headers or {})}
     merged_cookies = {**Default_Cookies, **(cookies or {})}
     # Only add LoginCert if not already present
     if "LoginCert" not in merged_cookies:
-        merged_cookies["LoginCert"] = Session.login_cert or LOGIN_CERT
-        print(f"LoginCert set to: {merged_cookies['LoginCert']}")
-    else:
-        print(f"LoginCert already present: {merged_cookies['LoginCert']}")
-    
+        merged_cookies["LoginCert"] = current_login_cert()
+    # Cookies go in as a header so they are not persisted on the shared client's cookie jar
+    merged_headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in merged_cookies.items() if value is not None)
+
     url = f"{BASE_API_URL.rstrip('/')}/{endpoint.lstrip('/')}"
-    
-    async with httpx.AsyncClient() as client:
-        print(f"Making request to {url} with cookies {merged_cookies}")
+
+    declared_ttl = cache_ttl_for(endpoint)
+    is_read = method == HTTPMethod.GET or declared_ttl is not None
+    hedge = UPSTREAM_HEDGE_READS and is_read if hedge is None else hedge
+
+    async def send():
+        return await _send_request(
+            method, endpoint, url, merged_headers, params, body, content, timeout,
+            idempotent=is_read or method in IDEMPOTENT_METHODS, hedge=hedge,
+        )
+
+    cache_ttl = declared_ttl if cache_ttl is None else cache_ttl
+    coalesce = declared_ttl is not None if coalesce is None else coalesce
+    if not cache_ttl and not coalesce:
+        return await send()
+
+    key = request_key(method.value, endpoint, params, content if content is not None else body, tenant_key(merged_cookies["LoginCert"]))
+    if cache_ttl:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    data = await single_flight.do(key, send) if coalesce else await send()
+    if cache_ttl:
+        response_cache.put(key, data, cache_ttl)
+    return data
+
+async def _send_request(method, endpoint, url, headers, params, body, content, timeout, idempotent=False, hedge=False) -> Optional[dict[str, Any]]:
+    client = get_http_client()
+    key = endpoint_key(endpoint)
+    attempts = UPSTREAM_MAX_RETRIES + 1 if idempotent else 1
+
+    async def send_once(attempt_timeout):
+        started = time.monotonic()
+        upstream_in_flight.inc()
+        status = "error"
         try:
             response = await client.request(
                 method=method.value,
                 url=url,
-                headers=merged_headers,
-                cookies=merged_cookies,
+                headers=headers,
                 params=params,
-                json=body if body else None,
-                timeout=timeout
+                json=body if body and content is None else None,
+                content=content,
+                timeout=attempt_timeout
             )
+            status = str(response.status_code)
+        finally:
+            elapsed = time.monotonic() - started
+            upstream_in_flight.dec()
+            upstream_requests.inc(key, method.value, status)
+            upstream_latency.observe(elapsed, key, method.value)
+        latency_window(key).record(elapsed)
+        return response
+
+    for attempt in range(attempts):
+        budget = remaining_time()
+        if budget is not None and budget <= 0:
+            stats["deadline_exceeded"] += 1
+            logger.warning("Upstream request skipped, the tool call deadline is exceeded", extra={"url": url})
+            return None
+        # A write cut short may still be applied upstream, only retried requests get the tighter timeout
+        attempt_timeout = adaptive_timeout(key, timeout or UPSTREAM_TIMEOUT) if idempotent else timeout or UPSTREAM_TIMEOUT
+        if budget is not None:
+            attempt_timeout = min(attempt_timeout, budget)
+        delay = hedge_delay(key) if hedge else None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Upstream request", extra={"method": method.value, "url": url, "attempt": attempt})
+        try:
+            if delay is not None and delay < attempt_timeout:
+                response = await hedged(lambda: send_once(attempt_timeout), delay)
+            else:
+                response = await send_once(attempt_timeout)
+            if response.status_code >= 500 and attempt < attempts - 1:
+                logger.warning("Upstream error, retrying", extra={"url": url, "status": response.status_code, "attempt": attempt})
+                await _backoff(attempt)
+                continue
             response.raise_for_status()
             if response.text:
                 return response.json()
+            return None
         except httpx.HTTPStatusError as e:
-            print(f"API error {e.response.status_code}: {e.response.text}")
+            logger.error("Upstream error", extra={"url": url, "status": e.response.status_code, "body": e.response.text[:500]})
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            if attempt < attempts - 1:
+                logger.warning("Upstream connection failed, retrying", extra={"url": url, "error": repr(e), "attempt": attempt})
+                await _backoff(attempt)
+                continue
+            logger.error("Upstream request failed", extra={"url": url, "error": repr(e)})
         except Exception as e:
-            print(f"Request failed: {e}")
+            logger.error("Upstream request failed", extra={"url": url, "error": repr(e)})
+        return None
     return None
 
+async def _backoff(attempt: int):
+    stats["retries"] += 1
+    delay = backoff_delay(attempt)
+    budget = remaining_time()
+    if budget is not None:
+        delay = min(delay, max(budget, 0))
+    await asyncio.sleep(delay)
+
 def format_strategy_summary(strategy: dict[str, Any]) -> str:
     """Create a readable summary from the strategy details."""
     return (
@@ -0,0 +1,140 @@
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per module levels, e.g. "utils.http_client=DEBUG,features=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE")
+# Share of DEBUG records kept, the hot paths log one per upstream call
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+_SECRETS = [
+    (re.compile(r"(LoginCert[\"']?\s*[=:]\s*[\"']?)[^;,\"'\s}]+", re.IGNORECASE), r"\1***"),
+    (re.compile(r"(PF_loginCert[\"']?\s*[=:]\s*[\"']?)[^;,\"'\s}]+", re.IGNORECASE), r"\1***"),
+]
+# Attributes every LogRecord has, anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def redact(text: str) -> str:
+    for pattern, replacement in _SECRETS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """Text or JSON lines with the record's `extra` fields, secrets redacted."""
+
+    def __init__(self, fmt: str = LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if self.json:
+            line = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            if record.exc_text:
+                line["exc_info"] = record.exc_text
+            return redact(json.dumps(line, default=str))
+
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return redact(line)
+
+
+class DebugSampler(logging.Filter):
+    """Keeps every record above DEBUG and a `rate` share of the DEBUG ones."""
+
+    def __init__(self, rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Only merges the message arguments on the calling thread, formatting happens on the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(mode: str = "sse"):
+    """Route all logging through a queue to a background writer thread.
+
+    In stdio mode stdout is the MCP protocol channel, so logs always go to LOG_FILE or stderr.
+    Calling it again replaces the writer thread, the records already queued are written first.
+    """
+    global _listener
+    if LOG_FILE:
+        output = logging.FileHandler(LOG_FILE)
+    else:
+        output = logging.StreamHandler(sys.stderr if mode == "stdio" else sys.stdout)
+    output.setFormatter(StructuredFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(DebugSampler())
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL.upper())
+    # httpx logs every request at INFO, which duplicates our own upstream logging
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _stop_listener()
+    _listener = listener
+
+def _stop_listener():
+    """Write the queued records and stop the writer thread, QueueListener.stop cannot run twice"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for output in listener.handlers:
+        output.close()
+
+def _parse_levels(spec: str) -> dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
@@ -0,0 +1,174 @@
+import time
+import functools
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, from a cache hit to a slow Planview call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def _label_text(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {} if self.labels else {(): 0}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {total}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+_registry: List[_Metric] = []
+# name -> object exposing `hits` and `misses`, read at scrape time
+_caches: Dict[str, Any] = {}
+# Callables returning extra exposition lines, read at scrape time
+_collectors: List[Callable[[], List[str]]] = []
+# Labels added to every series, rendered once, e.g. 'worker="2"'
+_constant_labels = ""
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def register_cache(name: str, cache: Any):
+    """Expose the hit/miss counters of a cache as `cache_hits_total` / `cache_misses_total` / `cache_hit_ratio`."""
+    _caches[name] = cache
+
+def register_collector(collector: Callable[[], List[str]]):
+    """Add exposition lines computed at scrape time (for values kept elsewhere)."""
+    _collectors.append(collector)
+
+def set_constant_labels(**labels: Any):
+    """Labels added to every series of this process, e.g. the worker index: each worker keeps its own
+    registry, so series scraped through the shared port must say which worker they come from."""
+    global _constant_labels
+    _constant_labels = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+def _with_constant_labels(line: str) -> str:
+    if not _constant_labels or line.startswith("#"):
+        return line
+    name_end = min(index for index in (line.find("{"), line.find(" ")) if index >= 0)
+    if line[name_end] == "{":
+        return f"{line[:name_end + 1]}{_constant_labels},{line[name_end + 1:]}"
+    return f"{line[:name_end]}{{{_constant_labels}}}{line[name_end:]}"
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    if _caches:
+        hits = {name: cache.hits for name, cache in _caches.items()}
+        misses = {name: cache.misses for name, cache in _caches.items()}
+        lines.append("# HELP cache_hits_total Cache lookups served from the cache")
+        lines.append("# TYPE cache_hits_total counter")
+        lines.extend(f'cache_hits_total{{cache="{name}"}} {value}' for name, value in hits.items())
+        lines.append("# HELP cache_misses_total Cache lookups that missed")
+        lines.append("# TYPE cache_misses_total counter")
+        lines.extend(f'cache_misses_total{{cache="{name}"}} {value}' for name, value in misses.items())
+        lines.append("# HELP cache_hit_ratio Share of cache lookups served from the cache")
+        lines.append("# TYPE cache_hit_ratio gauge")
+        for name in _caches:
+            lookups = hits[name] + misses[name]
+            lines.append(f'cache_hit_ratio{{cache="{name}"}} {hits[name] / lookups if lookups else 0}')
+    for collector in _collectors:
+        lines.extend(collector())
+    if _constant_labels:
+        lines = [_with_constant_labels(line) for line in lines]
+    return "\n".join(lines) + "\n"
+
+
+tool_calls = Counter("mcp_tool_calls_total", "MCP tool calls", ["tool"])
+tool_errors = Counter("mcp_tool_errors_total", "MCP tool calls that raised", ["tool"])
+tool_latency = Histogram("mcp_tool_duration_seconds", "MCP tool call duration", ["tool"])
+tools_in_flight = Gauge("mcp_tool_calls_in_flight", "MCP tool calls being processed")
+upstream_requests = Counter("upstream_requests_total", "Upstream (Planview) requests", ["endpoint", "method", "status"])
+upstream_latency = Histogram("upstream_request_duration_seconds", "Upstream (Planview) request duration", ["endpoint", "method"])
+upstream_in_flight = Gauge("upstream_requests_in_flight", "Upstream (Planview) requests waiting for a response")
+sse_sessions = Gauge("mcp_sse_sessions_active", "Open MCP SSE sessions")
+
+def instrument_tool_calls(mcp):
+    """Count and time every tool call of a FastMCP server."""
+    tool_manager = mcp._tool_manager
+    call_tool = tool_manager.call_tool
+
+    @functools.wraps(call_tool)
+    async def instrumented_call_tool(name, arguments, *args, **kwargs):
+        tool_calls.inc(name)
+        tools_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await call_tool(name, arguments, *args, **kwargs)
+        except BaseException:
+            tool_errors.inc(name)
+            raise
+        finally:
+            tools_in_flight.dec()
+            tool_latency.observe(time.perf_counter() - started, name)
+
+    tool_manager.call_tool = instrumented_call_tool
@@ -0,0 +1,53 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Iterator, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+# Default budget of a tool call for all of its upstream calls, in seconds
+TOOL_DEADLINE = float(os.getenv("TOOL_DEADLINE", "120"))
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    """Per tool call state that must not be shared between concurrent calls."""
+    login_cert: Optional[str] = None
+    # time.monotonic() value past which no upstream call should be started
+    deadline: Optional[float] = None
+
+
+_current: ContextVar[RequestContext] = ContextVar("request_context", default=RequestContext())
+
+def get_request_context() -> RequestContext:
+    return _current.get()
+
+@contextmanager
+def request_context(**values) -> Iterator[RequestContext]:
+    """Bind values (e.g. login_cert) for the current tool call and everything it awaits.
+
+    Each MCP request runs in its own task, so values bound here are never seen by other
+    concurrent calls. Unset values are inherited from the enclosing context, and a nested
+    deadline can only shrink the enclosing one.
+    """
+    values = {key: value for key, value in values.items() if value is not None}
+    context = _current.get()
+    if "deadline" in values and context.deadline is not None:
+        values["deadline"] = min(values["deadline"], context.deadline)
+    context = replace(context, **values)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """Deadline `seconds` from now, for `request_context(deadline=...)`."""
+    return time.monotonic() + seconds if seconds else None
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), None when there is no deadline."""
+    deadline = _current.get().deadline
+    return deadline - time.monotonic() if deadline is not None else None
@@ -0,0 +1,101 @@
+import os
+import re
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from dotenv import load_dotenv
+
+from utils.metrics import register_collector
+
+load_dotenv()
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "40"))
+UPSTREAM_MIN_TIMEOUT = float(os.getenv("UPSTREAM_MIN_TIMEOUT", "2"))
+# Adaptive timeout of idempotent requests = UPSTREAM_TIMEOUT_FACTOR x the endpoint's observed p99, within [min, UPSTREAM_TIMEOUT]
+UPSTREAM_TIMEOUT_FACTOR = float(os.getenv("UPSTREAM_TIMEOUT_FACTOR", "3"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "5"))
+UPSTREAM_HEDGE_READS = os.getenv("UPSTREAM_HEDGE_READS", "false").lower() in ("1", "true", "yes")
+LATENCY_WINDOW_SIZE = int(os.getenv("LATENCY_WINDOW_SIZE", "200"))
+# Samples needed before the window is trusted for timeouts and hedging
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))
+
+T = TypeVar("T")
+_ID_SEGMENT = re.compile(r"/(?=[^/]*\d)[^/]+(?=/|$)")
+
+
+class LatencyWindow:
+    """Rolling window of the latest upstream latencies of one endpoint."""
+
+    def __init__(self, size: int = LATENCY_WINDOW_SIZE):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if len(self._samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+_latencies: Dict[str, LatencyWindow] = {}
+stats = {"retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0}
+register_collector(lambda: [
+    line
+    for name, value in stats.items()
+    for line in (f"# TYPE upstream_{name}_total counter", f"upstream_{name}_total {value}")
+])
+
+def endpoint_key(endpoint: str) -> str:
+    """Groups the calls of one endpoint: drops the query string and masks id like path segments."""
+    path = "/" + endpoint.split("?", 1)[0].strip("/")
+    return _ID_SEGMENT.sub("/{id}", path)
+
+def latency_window(key: str) -> LatencyWindow:
+    window = _latencies.get(key)
+    if window is None:
+        window = _latencies[key] = LatencyWindow()
+    return window
+
+def adaptive_timeout(key: str, ceiling: float = UPSTREAM_TIMEOUT) -> float:
+    p99 = latency_window(key).percentile(99)
+    if p99 is None:
+        return ceiling
+    return min(ceiling, max(UPSTREAM_MIN_TIMEOUT, p99 * UPSTREAM_TIMEOUT_FACTOR))
+
+def hedge_delay(key: str) -> Optional[float]:
+    """How long to wait before hedging a read: the endpoint's observed p95."""
+    return latency_window(key).percentile(95)
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter exponential backoff for the given (0 based) retry."""
+    return random.uniform(0, min(UPSTREAM_BACKOFF_CAP, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+async def hedged(send: Callable[[], Awaitable[T]], delay: float) -> T:
+    """Run `send`, and if it has not answered after `delay` seconds run a duplicate; the first
+    successful answer wins and the other one is cancelled."""
+    first = asyncio.create_task(send())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    stats["hedges"] += 1
+    second = asyncio.create_task(send())
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        stats["hedge_wins"] += 1
+                    return task.result()
+        # Both failed, surface the original request's error
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
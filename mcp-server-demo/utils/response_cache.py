@@ -0,0 +1,146 @@
+import os
+import copy
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from dotenv import load_dotenv
+
+from utils.metrics import register_cache, register_collector
+
+load_dotenv()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+
+class ResponseCache:
+    """Short lived cache of upstream JSON responses, for read only endpoints.
+
+    Keys start with the endpoint so that `invalidate` can drop every response of an endpoint
+    prefix at once. Reads return deep copies, callers can mutate what they get.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: tuple, value: Any, ttl: float):
+        if ttl <= 0 or self.max_size <= 0 or value is None:
+            return
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint_prefix: Optional[str] = None):
+        """Drop the cached responses of every endpoint starting with `endpoint_prefix` (all when None)."""
+        if endpoint_prefix is None:
+            self._entries.clear()
+            return
+        prefix = normalize_endpoint(endpoint_prefix)
+        for key in [key for key in self._entries if key[0].startswith(prefix)]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls: the first caller starts it, the others await its result.
+
+    The call runs in its own task, so a caller that gets cancelled only stops waiting: the call goes
+    on for the others, and is cancelled once nobody waits for it any more.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+        return result if leader else copy.deepcopy(result)
+
+    def _done(self, key: Hashable, flight: _Flight):
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        # Every caller may have left already, no need for the "exception never retrieved" warning
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+
+response_cache = ResponseCache()
+single_flight = SingleFlight()
+register_cache("response", response_cache)
+register_collector(lambda: [
+    "# HELP upstream_coalesced_requests_total Requests that shared an identical in-flight upstream call",
+    "# TYPE upstream_coalesced_requests_total counter",
+    f"upstream_coalesced_requests_total {single_flight.coalesced}",
+])
+# Read only endpoints that declared themselves cacheable: (endpoint prefix, ttl)
+_cacheable_endpoints: list[tuple[str, float]] = []
+
+def normalize_endpoint(endpoint: str) -> str:
+    return "/" + endpoint.lstrip("/")
+
+def cacheable_endpoint(endpoint_prefix: str, ttl: float = RESPONSE_CACHE_TTL):
+    """Declare every endpoint starting with `endpoint_prefix` as a read whose responses can be
+    cached for `ttl` seconds and whose identical in-flight calls can be coalesced."""
+    _cacheable_endpoints.append((normalize_endpoint(endpoint_prefix), ttl))
+
+def cache_ttl_for(endpoint: str) -> Optional[float]:
+    endpoint = normalize_endpoint(endpoint)
+    for prefix, ttl in _cacheable_endpoints:
+        if endpoint.startswith(prefix):
+            return ttl
+    return None
+
+def invalidate_cached_responses(*endpoint_prefixes: str):
+    """Hook for mutating calls: forget the cached reads that the mutation may have made stale."""
+    for endpoint_prefix in endpoint_prefixes:
+        response_cache.invalidate(endpoint_prefix)
+
+def request_key(method: str, endpoint: str, params: Optional[dict], body: Any, tenant: str) -> tuple:
+    """Identity of a request for caching and coalescing. The endpoint comes first, see `ResponseCache.invalidate`."""
+    if isinstance(body, bytes):
+        body = body.decode()
+    return (
+        normalize_endpoint(endpoint),
+        method,
+        json.dumps(params, sort_keys=True, default=str) if params else "",
+        body if isinstance(body, str) else json.dumps(body, sort_keys=True, default=str) if body else "",
+        tenant,
+    )
@@ -1,4 +1,6 @@
 from mcp.server.fastmcp import FastMCP
+from utils.work_cache import WorkCache
+from utils.metrics import instrument_tool_calls, register_cache
 
 # # Singleton instance
 # _mcp_instance = FastMCP("PortfolioMCP")
@@ -10,6 +12,7 @@ from mcp.server.fastmcp import FastMCP
 #     return _mcp_instance
 
 mcp = FastMCP("PortfolioMCP")
+instrument_tool_calls(mcp)
 def set_mcp(mcp_instance: FastMCP):
     global mcp
     mcp = mcp_instance
@@ -18,4 +21,5 @@ def set_mcp(mcp_instance: FastMCP):
 class Session:
     login_cert = None
 
-work_cache = {}
+work_cache = WorkCache()
+register_cache("work", work_cache)
@@ -0,0 +1,138 @@
+import os
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+from utils.http_client import make_api_request, HTTPMethod, tenant_key
+from utils.response_cache import single_flight
+from utils.metrics import register_cache
+
+load_dotenv()
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", "300"))
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "256"))
+# Fields of a "new structure" template that are unique per created work and so can never be served from the cache
+TEMPLATE_SERVER_FIELDS = tuple(
+    field.strip() for field in os.getenv("TEMPLATE_SERVER_FIELDS", "StructureCode").split(",") if field.strip()
+)
+# Set when Planview's create response returns the server owned fields of the created work. Templates are
+# then served from the cache. Otherwise every create takes them from its own `/new` call, as Planview hands them out
+TEMPLATE_SERVER_FIELDS_FROM_CREATE = os.getenv("TEMPLATE_SERVER_FIELDS_FROM_CREATE", "false").lower() in ("1", "true", "yes")
+
+
+class TemplateCache:
+    """LRU + TTL cache for the `/new` structure templates returned by Planview.
+
+    Entries are keyed by (endpoint, father_code, tenant). Reads always return a deep copy,
+    so callers are free to fill the payload in, and never contain the `server_fields`:
+    those still have to come from the server on each call. The cache is only used when
+    `server_fields_from_create` says the create response carries them.
+    """
+
+    def __init__(
+        self,
+        ttl: float = TEMPLATE_CACHE_TTL,
+        max_size: int = TEMPLATE_CACHE_SIZE,
+        server_fields: Iterable[str] = TEMPLATE_SERVER_FIELDS,
+        server_fields_from_create: bool = TEMPLATE_SERVER_FIELDS_FROM_CREATE,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.server_fields = tuple(server_fields)
+        self.server_fields_from_create = server_fields_from_create
+        self._entries: "OrderedDict[tuple, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, endpoint: str, father_code: Optional[str] = None, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = (endpoint, father_code, tenant or tenant_key())
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, endpoint: str, father_code: Optional[str], template: Dict[str, Any], tenant: Optional[str] = None):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        key = (endpoint, father_code, tenant or tenant_key())
+        self._entries[key] = (time.monotonic() + self.ttl, self.without_server_fields(template))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def without_server_fields(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        """Deep copy of a template, minus the server owned fields."""
+        return {field: value for field, value in copy.deepcopy(template).items() if field not in self.server_fields}
+
+    def missing_server_fields(self, payload: Dict[str, Any]) -> list[str]:
+        """Server owned fields that the payload does not carry yet."""
+        return [field for field in self.server_fields if payload.get(field) is None]
+
+    def invalidate(self, endpoint: Optional[str] = None, father_code: Optional[str] = None):
+        if endpoint is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == endpoint and (father_code is None or key[1] == father_code)]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+template_cache = TemplateCache()
+register_cache("template", template_cache)
+
+async def fetch_structure_template(endpoint: str, father_code: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return a `/new` structure template, from the cache when the create response carries the server
+    owned fields (`TemplateCache.server_fields_from_create`).
+
+    Without it, every call fetches its own template, with the server owned fields handed out for the
+    work about to be created. With it, concurrent misses for one template share a single upstream call.
+    Only that call's caller gets the server owned fields, a cache hit or a shared result does not carry
+    them (see `TemplateCache.missing_server_fields`): the caller takes them from the create response.
+    """
+    if not template_cache.server_fields_from_create:
+        url = endpoint.format(father_code=father_code) if father_code is not None else endpoint
+        return await make_api_request(url, HTTPMethod.GET)
+
+    tenant = tenant_key()
+    cached = template_cache.get(endpoint, father_code, tenant)
+    if cached is not None:
+        return cached
+
+    fetched = False
+
+    async def fetch():
+        nonlocal fetched
+        fetched = True
+        url = endpoint.format(father_code=father_code) if father_code is not None else endpoint
+        json_response = await make_api_request(url, HTTPMethod.GET)
+        if json_response:
+            template_cache.put(endpoint, father_code, json_response, tenant)
+        return json_response
+
+    json_response = await single_flight.do(("template", endpoint, father_code, tenant), fetch)
+    if json_response and not fetched:
+        # Already a copy of its own, made by single_flight
+        for field in template_cache.server_fields:
+            json_response.pop(field, None)
+    return json_response
+
+def created_structure_code(payload: Dict[str, Any], response: Optional[Dict[str, Any]]) -> str:
+    """StructureCode of a work created from the template `payload`: the one `/new` handed out with a
+    fetched template, taken from the create response for a cached one. Raises when neither carries the
+    server owned fields, e.g. a cached template whose create failed or answered without them."""
+    created = {
+        **{field: value for field, value in (response or {}).items() if value is not None},
+        **{field: value for field, value in payload.items() if value is not None},
+    }
+    missing = template_cache.missing_server_fields(created)
+    if missing:
+        raise RuntimeError(f"Planview did not return {', '.join(missing)} for the created work '{payload.get('Description')}'")
+    return created["StructureCode"]
@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import logging
+import importlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from dotenv import load_dotenv
+from mcp import types
+
+logger = logging.getLogger(__name__)
+
+PATH = Path(__file__).resolve().parents[1]
+TOOLS_DIR = PATH / "tools"
+
+load_dotenv()
+TOOL_MANIFEST = os.getenv("TOOL_MANIFEST") or str(PATH / "tool_manifest.json")
+# Set to false to always import every tool module at startup
+LAZY_TOOLS = os.getenv("LAZY_TOOLS", "true").lower() in ("1", "true", "yes")
+
+MANIFEST_VERSION = 1
+
+
+def _source_hash(module_name: str) -> str:
+    source = TOOLS_DIR / f"{module_name}.py"
+    return hashlib.sha256(source.read_bytes()).hexdigest() if source.exists() else ""
+
+def _dump(model: Any) -> Optional[dict]:
+    return model.model_dump(mode="json", exclude_none=True) if model is not None else None
+
+def build_manifest(mcp, module_names: Iterable[str]) -> Dict[str, Any]:
+    """Import every tool module and record what it registers on `mcp`.
+
+    Must run in a process where the modules were not imported yet: the tools of a module are the
+    ones that appear while importing it. Modules that register resources are marked `eager`,
+    they are imported at startup as resource templates cannot be matched from the manifest.
+    """
+    modules = {}
+    for module_name in module_names:
+        tools_before = set(mcp._tool_manager._tools)
+        prompts_before = set(mcp._prompt_manager._prompts)
+        resources_before = len(mcp._resource_manager._resources) + len(mcp._resource_manager._templates)
+        importlib.import_module(f"tools.{module_name}")
+        tools = [tool for name, tool in mcp._tool_manager._tools.items() if name not in tools_before]
+        prompts = [prompt for name, prompt in mcp._prompt_manager._prompts.items() if name not in prompts_before]
+        resources_after = len(mcp._resource_manager._resources) + len(mcp._resource_manager._templates)
+        modules[module_name] = {
+            "source_hash": _source_hash(module_name),
+            "eager": resources_after > resources_before,
+            "tools": [
+                {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "inputSchema": tool.parameters,
+                    "annotations": _dump(tool.annotations),
+                }
+                for tool in tools
+            ],
+            "prompts": [
+                {
+                    "name": prompt.name,
+                    "description": prompt.description,
+                    "arguments": [_dump(argument) for argument in prompt.arguments or []],
+                }
+                for prompt in prompts
+            ],
+        }
+    return {"version": MANIFEST_VERSION, "modules": modules}
+
+def write_manifest(manifest: Dict[str, Any], path: str = TOOL_MANIFEST):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def load_manifest(path: str = TOOL_MANIFEST) -> Optional[Dict[str, Any]]:
+    """The manifest at `path`, or None when there is none. Modules whose source changed since the
+    build are marked `stale` and get imported at startup."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable tool manifest", extra={"path": path, "error": repr(e)})
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning("Ignoring tool manifest of another version, rebuild it with --build_manifest", extra={"path": path})
+        return None
+    for module_name, module in manifest["modules"].items():
+        module["stale"] = module["source_hash"] != _source_hash(module_name)
+        if module["stale"]:
+            logger.warning("Tool manifest is out of date, importing the module at startup", extra={"tool_module": module_name})
+    return manifest
+
+
+class LazyTools:
+    """Serves list_tools / list_prompts from a manifest and imports a tool module on its first call."""
+
+    def __init__(self, mcp, manifest: Dict[str, Any], module_names: Iterable[str]):
+        self.mcp = mcp
+        self.modules = {name: manifest["modules"].get(name) for name in module_names}
+        self.loaded: set[str] = set()
+        self._tool_modules = {}
+        self._prompt_modules = {}
+        for module_name, module in self.modules.items():
+            if module is None:
+                continue
+            for tool in module["tools"]:
+                self._tool_modules[tool["name"]] = module_name
+            for prompt in module["prompts"]:
+                self._prompt_modules[prompt["name"]] = module_name
+
+    def load(self, module_name: str):
+        if module_name not in self.loaded:
+            importlib.import_module(f"tools.{module_name}")
+            self.loaded.add(module_name)
+
+    def load_eager_modules(self):
+        """Import the modules that cannot be served from the manifest (missing, stale or eager)."""
+        for module_name, module in self.modules.items():
+            if module is None or module["stale"] or module["eager"]:
+                self.load(module_name)
+
+    def _pending(self) -> list[dict]:
+        return [module for name, module in self.modules.items() if name not in self.loaded]
+
+    async def list_tools(self) -> list[types.Tool]:
+        tools = await self.mcp.list_tools()
+        tools += [
+            types.Tool(
+                name=tool["name"],
+                description=tool["description"],
+                inputSchema=tool["inputSchema"],
+                annotations=types.ToolAnnotations(**tool["annotations"]) if tool["annotations"] else None,
+            )
+            for module in self._pending()
+            for tool in module["tools"]
+        ]
+        return tools
+
+    async def list_prompts(self) -> list[types.Prompt]:
+        prompts = await self.mcp.list_prompts()
+        prompts += [
+            types.Prompt(
+                name=prompt["name"],
+                description=prompt["description"],
+                arguments=[types.PromptArgument(**argument) for argument in prompt["arguments"]],
+            )
+            for module in self._pending()
+            for prompt in module["prompts"]
+        ]
+        return prompts
+
+    def install(self):
+        tool_manager = self.mcp._tool_manager
+        prompt_manager = self.mcp._prompt_manager
+        get_tool = tool_manager.get_tool
+        get_prompt = prompt_manager.get_prompt
+
+        def lazy_get_tool(name: str):
+            if name not in tool_manager._tools and name in self._tool_modules:
+                self.load(self._tool_modules[name])
+            return get_tool(name)
+
+        def lazy_get_prompt(name: str):
+            if name not in prompt_manager._prompts and name in self._prompt_modules:
+                self.load(self._prompt_modules[name])
+            return get_prompt(name)
+
+        tool_manager.get_tool = lazy_get_tool
+        prompt_manager.get_prompt = lazy_get_prompt
+        self.mcp._mcp_server.list_tools()(self.list_tools)
+        self.mcp._mcp_server.list_prompts()(self.list_prompts)
+        self.load_eager_modules()
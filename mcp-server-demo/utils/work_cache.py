@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+WORK_CACHE_TTL = float(os.getenv("WORK_CACHE_TTL", str(7 * 24 * 3600)))
+WORK_CACHE_MAX_ENTRIES = int(os.getenv("WORK_CACHE_MAX_ENTRIES", "1000"))
+WORK_CACHE_MAX_BYTES = int(os.getenv("WORK_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Optional SQLite file, shared by every server worker on the host and kept across restarts
+WORK_CACHE_DB = os.getenv("WORK_CACHE_DB")
+
+
+class WorkCache:
+    """Maps the works created through the tools to their Planview structure codes.
+
+    Each entry is the `{name: structure_code}` map of one work (the project itself under "self"),
+    namespaced by tenant so that two login certs never see each other's works. The in-memory tier
+    is an LRU bounded both in entries and in (approximate) bytes, with a TTL on every entry.
+    When `db_path` is set, entries are written through to SQLite and read back on a memory miss,
+    in a worker thread so the event loop never waits on the disk.
+    """
+
+    def __init__(
+        self,
+        ttl: float = WORK_CACHE_TTL,
+        max_entries: int = WORK_CACHE_MAX_ENTRIES,
+        max_bytes: int = WORK_CACHE_MAX_BYTES,
+        db_path: Optional[str] = WORK_CACHE_DB,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[str, str], tuple[float, Dict[str, str], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._db = self._open_db(db_path) if db_path else None
+        # The connection is shared by the worker threads, one query at a time
+        self._db_lock = threading.Lock()
+
+    async def get(self, tenant: str, work_name: str) -> Dict[str, str]:
+        """Structure codes of a work, or an empty dict when it is unknown or expired."""
+        key = (tenant, work_name)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+        if entry is not None:
+            self._evict(key)
+
+        stored = await asyncio.to_thread(self._load, tenant, work_name) if self._db is not None else None
+        if stored is None:
+            self.misses += 1
+            return {}
+        expires_at, codes = stored
+        self._remember(key, codes, expires_at)
+        self.hits += 1
+        return dict(codes)
+
+    async def set(self, tenant: str, work_name: str, codes: Dict[str, str]):
+        """Store (replace) the structure codes of a work."""
+        expires_at = time.time() + self.ttl
+        self._remember((tenant, work_name), dict(codes), expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._store, tenant, work_name, dict(codes), expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM work_cache")
+
+    def _remember(self, key, codes, expires_at):
+        if key in self._entries:
+            self._evict(key)
+        size = len(json.dumps(codes)) + len(key[0]) + len(key[1])
+        self._entries[key] = (expires_at, codes, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        # WAL lets several server workers read while one of them writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS work_cache ("
+            " tenant TEXT NOT NULL, work_name TEXT NOT NULL, codes TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (tenant, work_name))"
+        )
+        with db:
+            db.execute("DELETE FROM work_cache WHERE expires_at <= ?", (time.time(),))
+        return db
+
+    def _load(self, tenant, work_name):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, codes FROM work_cache WHERE tenant = ? AND work_name = ? AND expires_at > ?",
+                (tenant, work_name, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _store(self, tenant, work_name, codes, expires_at):
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO work_cache (tenant, work_name, codes, expires_at) VALUES (?, ?, ?, ?)",
+                (tenant, work_name, json.dumps(codes), expires_at),
+            )
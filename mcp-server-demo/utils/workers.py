@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import multiprocessing
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import httpx
+from dotenv import load_dotenv
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Seconds before restarting a worker that exited, doubled after each exit that follows a short run
+WORKER_RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", "0.5"))
+WORKER_RESTART_MAX_DELAY = float(os.getenv("WORKER_RESTART_MAX_DELAY", "30"))
+# A worker that ran this many seconds before exiting gets restarted without backoff
+WORKER_STABLE_SECONDS = float(os.getenv("WORKER_STABLE_SECONDS", "60"))
+# Exits in a row after a short run before the server gives up
+WORKER_MAX_RESTARTS = int(os.getenv("WORKER_MAX_RESTARTS", "5"))
+# Exit code of a worker that could not start (e.g. its tools failed to load), restarting it cannot help
+WORKER_STARTUP_FAILED = 3
+
+# Headers that describe the hop, not the message
+_HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "content-length"}
+_WORKER_IN_PATH = re.compile(r"/messages/(\d+)/?$")
+
+
+@dataclass(frozen=True)
+class WorkerInfo:
+    """Position of this process among the workers sharing the listening socket."""
+    index: int
+    count: int
+    socket_dir: str
+
+    @property
+    def message_endpoint(self) -> str:
+        # The owning worker travels in the endpoint the SSE client posts its messages to
+        return f"/messages/{self.index}/"
+
+    def socket_path(self, index: Optional[int] = None) -> str:
+        """Unix socket on which a worker accepts the messages forwarded by its peers."""
+        return os.path.join(self.socket_dir, f"worker-{self.index if index is None else index}.sock")
+
+
+class MessageRouter:
+    """ASGI app for `/messages`: handles the messages of this worker's SSE sessions and forwards
+    the others to the worker that owns the stream, over that worker's unix socket.
+
+    SSE session state lives in the memory of the process that accepted the GET /sse, while the
+    kernel hands the POSTs to whichever worker accepts them first.
+    """
+
+    def __init__(self, worker: WorkerInfo, handle_local: ASGIApp):
+        self.worker = worker
+        self.handle_local = handle_local
+        self._peers: Dict[int, httpx.AsyncClient] = {}
+        self.forwarded = 0
+
+    def _peer(self, index: int) -> httpx.AsyncClient:
+        client = self._peers.get(index)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(uds=self.worker.socket_path(index))
+            client = self._peers[index] = httpx.AsyncClient(transport=transport, base_url="http://worker", timeout=30)
+        return client
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        match = _WORKER_IN_PATH.search(scope["path"])
+        owner = int(match.group(1)) if match else self.worker.index
+        if owner == self.worker.index or owner >= self.worker.count:
+            await self.handle_local(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        headers = {key: value for key, value in request.headers.items() if key not in _HOP_HEADERS}
+        self.forwarded += 1
+        try:
+            upstream = await self._peer(owner).post(
+                scope["path"], params=request.query_params, headers=headers, content=await request.body(),
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Could not forward the message to its worker", extra={"worker": owner, "error": repr(e)})
+            response = Response("Session worker unavailable", status_code=503)
+        else:
+            response = Response(
+                upstream.content, status_code=upstream.status_code,
+                media_type=upstream.headers.get("content-type"),
+            )
+        await response(scope, receive, send)
+
+    async def aclose(self):
+        for client in self._peers.values():
+            await client.aclose()
+        self._peers.clear()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """TCP socket shared by every worker, the kernel spreads the connections between them."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+def bind_worker_socket(worker: WorkerInfo) -> socket.socket:
+    path = worker.socket_path()
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    return sock
+
+def serve_workers(target: Callable[..., Any], args: Any, host: str, port: int, workers: int) -> int:
+    """Run `target(args, worker, sock)` in `workers` processes sharing one listening socket.
+
+    A worker that dies is restarted under the same index (its SSE sessions are lost, clients
+    reconnect), after a delay that doubles while it keeps exiting shortly after its start.
+    Returns 0 once SIGINT / SIGTERM stopped every worker, 1 when a worker exited with
+    WORKER_STARTUP_FAILED or more than WORKER_MAX_RESTARTS times in a row.
+    """
+    sock = bind_socket(host, port)
+    socket_dir = tempfile.mkdtemp(prefix="mcp-workers-")
+    context = multiprocessing.get_context("spawn")
+    processes: Dict[int, multiprocessing.Process] = {}
+    started_at: Dict[int, float] = {}
+    # Exits in a row after a short run, and when the exited workers are due to restart
+    exits: Dict[int, int] = {}
+    restart_at: Dict[int, float] = {}
+    stopping = False
+    failed = False
+
+    def start(index: int):
+        worker = WorkerInfo(index=index, count=workers, socket_dir=socket_dir)
+        process = context.Process(target=target, args=(args, worker, sock), name=f"mcp-worker-{index}")
+        process.start()
+        processes[index] = process
+        started_at[index] = time.monotonic()
+        logger.info("Started worker", extra={"worker": index, "pid": process.pid})
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for index in range(workers):
+            start(index)
+        while not stopping:
+            now = time.monotonic()
+            for index, process in list(processes.items()):
+                if process.is_alive() or stopping:
+                    continue
+                if index in restart_at:
+                    if now >= restart_at[index]:
+                        del restart_at[index]
+                        start(index)
+                    continue
+                if process.exitcode == WORKER_STARTUP_FAILED:
+                    logger.error("Worker failed to start, stopping the server", extra={"worker": index})
+                    stopping = failed = True
+                    break
+                exits[index] = exits.get(index, 0) + 1 if now - started_at[index] < WORKER_STABLE_SECONDS else 1
+                if exits[index] > WORKER_MAX_RESTARTS:
+                    logger.error("Worker keeps exiting, stopping the server", extra={"worker": index, "exits": exits[index]})
+                    stopping = failed = True
+                    break
+                delay = min(WORKER_RESTART_MAX_DELAY, WORKER_RESTART_DELAY * 2 ** (exits[index] - 1))
+                logger.warning("Worker exited, restarting it", extra={"worker": index, "exitcode": process.exitcode, "delay": delay})
+                restart_at[index] = now + delay
+            time.sleep(0.5)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+        sock.close()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+    return 1 if failed else 0